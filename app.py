@@ -1,14 +1,46 @@
 import os
+import hmac
 import json
-from flask import Flask, render_template, jsonify, request
-from werkzeug.utils import secure_filename
+import math
+import time
+import threading
+import zlib
+import base64
+from functools import wraps
+from itertools import islice
+from flask import Flask, Response, abort, g, render_template, jsonify, request, send_from_directory, url_for
+from flask import before_render_template, template_rendered
+from pet_store import PetStore, time_key
+from spatial_index import EARTH_RADIUS_KM, valid_latlng
+from image_store import ImageStore
+from symptom_engine import SymptomRules
+from metrics import registry
+from profiler import SamplingProfiler
+from precompressed import CompressedBody, build_asset_manifest
 
 app = Flask(__name__)
 
 # --- Configuration ---
 UPLOAD_FOLDER = 'static/uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-DATA_FILE = 'data.json'
+app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # whole multipart body, photo included
+DATA_FILE = 'data.json'  # legacy whole-file store, migrated into PETS_LOG_FILE once
+PETS_LOG_FILE = 'pets.log'
+pet_store = PetStore(PETS_LOG_FILE, legacy_path=DATA_FILE)
+image_store = ImageStore(UPLOAD_FOLDER, '/uploads', is_referenced=pet_store.image_in_use)
+image_store.sweep()  # picks up deletions whose reap was pending when the last worker exited
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60  # for content-hashed URLs (uploads, /assets), which never change
+PETS_PAGE_DEFAULT_LIMIT, PETS_PAGE_MAX_LIMIT = 100, 500
+SIGHTING_KINDS = ('sighted', 'searched')
+# Each open change stream holds one server thread (see the Procfile), so streams
+# are bounded in lifetime and in number; refused clients poll /api/pets/changes.
+CHANGE_STREAM_POLL_SECONDS = 1
+CHANGE_STREAM_MAX_SECONDS = 30  # EventSource reconnects with Last-Event-ID
+CHANGE_STREAM_MAX_CLIENTS = 24  # per worker; below the Procfile's --threads so other requests still get served
+change_stream_slots = threading.BoundedSemaphore(CHANGE_STREAM_MAX_CLIENTS)
+# Opt-in profiling: requests carrying "X-Profile: <secret>" dump collapsed stacks to PROFILE_FOLDER.
+app.config['PROFILE_SECRET'] = os.environ.get('PETHELP_PROFILE_SECRET')
+app.config['PROFILE_FOLDER'] = 'profiles'
 
 # --- DATA FOR SYMPTOM CHECKER ---
 
@@ -94,6 +126,14 @@ CAT_SYMPTOM_DATA = {
     }
 }
 
+# Compiled once at import; evaluate() results are memoized per symptom set.
+SYMPTOM_RULES = {
+    'puppy': SymptomRules(PUPPY_SYMPTOM_DATA),
+    'adult_dog': SymptomRules(ADULT_DOG_SYMPTOM_DATA),
+    'cat': SymptomRules(CAT_SYMPTOM_DATA),
+}
+SYMPTOM_BATCH_MAX_CHECKS = 100
+
 # UPDATED: Checklist data
 DOG_CHECKLIST = [
     "Behavior: Is your dog acting unusually quiet, agitated, or aggressive?",
@@ -115,128 +155,416 @@ CAT_CHECKLIST = [
 ]
 
 
-# --- Helper Functions for Pet Data  ---
-def load_data():
-    if not os.path.exists(DATA_FILE): return {}
-    with open(DATA_FILE, 'r') as f:
-        try: return json.load(f)
-        except json.JSONDecodeError: return {}
+# Reference points drawn on the lost pet map
+CENTRAL_LOCATIONS = [
+    {"name": "DHA Phase 5", "coords": [31.478, 74.375]},
+    {"name": "Gulberg (Liberty Mkt)", "coords": [31.509, 74.333]},
+    {"name": "Cantt (Fortress Stadium)", "coords": [31.536, 74.366]},
+    {"name": "Model Town", "coords": [31.474, 74.332]},
+    {"name": "Johar Town", "coords": [31.464, 74.282]},
+    {"name": "Lake City", "coords": [31.363, 74.244]},
+    {"name": "Bahria Town", "coords": [31.365, 74.185]},
+    {"name": "Garden Town", "coords": [31.500, 74.312]},
+    {"name": "Mall Road (Charing Cross)", "coords": [31.558, 74.333]},
+    {"name": "MM Alam Road", "coords": [31.516, 74.343]},
+    {"name": "Wapda Town", "coords": [31.442, 74.269]},
+]
+
+
+# --- Helper Functions for Pet Queries ---
+def encode_cursor(pet):
+    return base64.urlsafe_b64encode(json.dumps(time_key(pet)).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        submitted, pet_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (int(submitted), str(pet_id))
+    except (ValueError, TypeError, OverflowError):
+        raise ValueError("Invalid cursor")
+
+def parse_bbox(value):
+    # "west,south,east,north" -> (south, west, north, east), clamped to the globe.
+    west, south, east, north = (float(v) for v in value.split(','))
+    if not all(map(math.isfinite, (west, south, east, north))): raise ValueError
+    clamp = lambda v, limit: min(max(v, -limit), limit)
+    return (clamp(south, 90), clamp(west, 180), clamp(north, 90), clamp(east, 180))
+
+def parse_pet_query(args):
+    # Raises ValueError with a client-facing message on bad parameters.
+    query = {"bbox": None, "near": None, "after": None, "before": None, "until": None,
+             "status": None, "limit": None, "descending": args.get('order') == 'desc'}
+    if args.get('order', 'asc') not in ('asc', 'desc'): raise ValueError("order must be 'asc' or 'desc'")
+    try:
+        if 'bbox' in args:
+            query['bbox'] = parse_bbox(args['bbox'])
+        elif 'near' in args:
+            lat, lng = (float(v) for v in args['near'].split(','))
+            radius_km = float(args.get('radius_km', 2))
+            if not valid_latlng(lat, lng) or not 0 < radius_km < math.inf: raise ValueError
+            # Nothing on Earth is further than half its circumference away.
+            query['near'] = (lat, lng, min(radius_km, math.pi * EARTH_RADIUS_KM))
+    except ValueError:
+        raise ValueError("Invalid bbox or near/radius_km parameters")
+
+    try:
+        # Keys are strictly after query['after']; (t + 1,) sorts above every key at t
+        # and below every key at t + 1, so submitted_after excludes t itself.
+        if 'submitted_after' in args: query['after'] = (int(args['submitted_after']) + 1,)
+        if 'submitted_before' in args: query['until'] = int(args['submitted_before'])
+    except ValueError:
+        raise ValueError("submitted_after/submitted_before must be epoch milliseconds")
+    if 'cursor' in args:
+        # A cursor is the last key of the previous page: the next page continues
+        # past it in the requested order.
+        cursor = decode_cursor(args['cursor'])
+        if query['descending']: query['before'] = cursor
+        else: query['after'] = max(query['after'], cursor) if query['after'] else cursor
+
+    status = args.get('status')
+    if status is not None and status not in ('found', 'not-found'):
+        raise ValueError("status must be 'found' or 'not-found'")
+    query['status'] = status
+
+    if 'limit' in args or 'cursor' in args:
+        try: limit = int(args.get('limit', PETS_PAGE_DEFAULT_LIMIT))
+        except ValueError: limit = 0
+        if limit < 1: raise ValueError("limit must be a positive integer")
+        query['limit'] = min(limit, PETS_PAGE_MAX_LIMIT)
+    return query
+
+def iter_pets(query, batch_size=500):
+    # Pets matching the query in (submissionTime, id) order, or newest first when
+    # descending. Pages come from the store's time index, so the whole dataset is
+    # never held at once and a limited area page stays cheap however many pets
+    # are in view.
+    if (query['bbox'] or query['near']) and not query['limit']:
+        # The whole area is wanted anyway: fetch it once and sort it.
+        area = pet_store.within_bbox(*query['bbox']) if query['bbox'] else pet_store.near(*query['near'])
+        for pet in sorted(area.values(), key=time_key, reverse=query['descending']):
+            if query['after'] and time_key(pet) <= query['after']: continue
+            if query['before'] and time_key(pet) >= query['before']: continue
+            if query['until'] is not None and pet.get('submissionTime', 0) > query['until']: continue
+            if query['status'] and pet.get('status') != query['status']: continue
+            yield pet
+        return
+    after, before = query['after'], query['before']
+    batch_size = query['limit'] or batch_size
+    while True:
+        batch = pet_store.by_time(after, query['until'], query['status'], batch_size, before, query['descending'],
+                                  bbox=query['bbox'], near=query['near'])
+        yield from batch
+        if len(batch) < batch_size: return
+        if query['descending']: before = time_key(batch[-1])
+        else: after = time_key(batch[-1])
+
+def iter_ndjson(query):
+    for pet in islice(iter_pets(query), query['limit']):
+        yield json.dumps(pet) + '\n'
+
+# --- Request Metrics & Profiling ---
+@app.before_request
+def start_request_metrics():
+    registry.ensure_flusher()
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_start = time.perf_counter()
+    registry.inc("pethelp_http_requests_in_flight", route=g.metrics_route)
+
+    secret = app.config['PROFILE_SECRET']
+    if secret and hmac.compare_digest(request.headers.get('X-Profile', '').encode(), secret.encode()):
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streamed bodies (NDJSON, SSE) are timed up to their headers.
+    if 'metrics_start' not in g: return response
+    labels = {"route": g.metrics_route, "method": request.method}
+    registry.observe("pethelp_http_request_duration_seconds", time.perf_counter() - g.metrics_start, **labels)
+    registry.inc("pethelp_http_requests_total", status=str(response.status_code), **labels)
+    if 'profiler' in g:
+        response.headers['X-Profile-File'] = g.pop('profiler').stop(app.config['PROFILE_FOLDER'], g.metrics_route)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'metrics_start' in g:
+        registry.inc("pethelp_http_requests_in_flight", -1, route=g.metrics_route)
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    g.template_start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def record_template_time(sender, template, context, **extra):
+    if 'template_start' in g:
+        registry.observe("pethelp_span_duration_seconds", time.perf_counter() - g.pop('template_start'), span="template_render")
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+# --- Pre-rendered Pages & Static Assets ---
+# Page output only depends on module-level constants, so each page is rendered
+# once and kept with its gzip/brotli variants. In debug mode everything is
+# rebuilt per request so template and asset edits show up immediately.
+page_cache = {}    # view name -> CompressedBody
+asset_cache = {}   # "urls": {name: hashed name}, "bodies": {hashed name: CompressedBody}
+
+def send_precompressed(body, cache_control):
+    encoding, data = body.choose(request.accept_encodings)
+    etag = body.etag(encoding)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(data, mimetype=body.mimetype)
+        if encoding != 'identity': response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def prerendered(view):
+    @wraps(view)
+    def cached_view():
+        if view.__name__ not in page_cache or app.debug:
+            page_cache[view.__name__] = CompressedBody(view().encode('utf-8'), 'text/html')
+        return send_precompressed(page_cache[view.__name__], 'no-cache')
+    return cached_view
+
+def assets():
+    if not asset_cache or app.debug:
+        asset_cache['urls'], asset_cache['bodies'] = build_asset_manifest(app.static_folder)
+    return asset_cache
+
+@app.template_global()
+def asset_url(filename):
+    hashed = assets()['urls'].get(filename)
+    if hashed: return url_for('asset', filename=hashed)
+    return url_for('static', filename=filename)
 
-def save_data(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    body = assets()['bodies'].get(filename)
+    if not body: abort(404)
+    return send_precompressed(body, f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
 
 # --- Page Routes ---
 @app.route('/')
+@prerendered
 def home(): return render_template('index.html')
 
 @app.route('/symptom-checker')
+@prerendered
 def symptom_checker():
     # Pass checklist data to the template
     return render_template('symptom_checker.html', dog_checklist=DOG_CHECKLIST, cat_checklist=CAT_CHECKLIST)
 
 @app.route('/lost-pet-map')
+@prerendered
 def lost_pet_map():
-    central_locations = [
-        {"name": "DHA Phase 5", "coords": [31.478, 74.375]},
-        {"name": "Gulberg (Liberty Mkt)", "coords": [31.509, 74.333]},
-        {"name": "Cantt (Fortress Stadium)", "coords": [31.536, 74.366]},
-        {"name": "Model Town", "coords": [31.474, 74.332]},
-        {"name": "Johar Town", "coords": [31.464, 74.282]},
-        {"name": "Lake City", "coords": [31.363, 74.244]},
-        {"name": "Bahria Town", "coords": [31.365, 74.185]},
-        {"name": "Garden Town", "coords": [31.500, 74.312]},
-        {"name": "Mall Road (Charing Cross)", "coords": [31.558, 74.333]},
-        {"name": "MM Alam Road", "coords": [31.516, 74.343]},
-        {"name": "Wapda Town", "coords": [31.442, 74.269]},
-    ]
-    return render_template('lost_pet_map.html', locations=central_locations)
+    return render_template('lost_pet_map.html', locations=CENTRAL_LOCATIONS)
 
 @app.route('/wip')
+@prerendered
 def wip(): return render_template('wip.html')
 
 # --- API Endpoints ---
+def check_symptoms(data):
+    # Returns (result, error message) for one {"animal_type", "symptoms"} request.
+    if not isinstance(data, dict): return None, "Each check must be an object"
+    symptoms = data.get('symptoms', [])
+    if not symptoms: return None, "No symptoms provided"
+    if not isinstance(symptoms, list) or not all(isinstance(s, str) for s in symptoms):
+        return None, "symptoms must be a list of strings"
+    rules = SYMPTOM_RULES.get(data.get('animal_type'))
+    if not rules: return None, "Invalid animal type"
+    return rules.evaluate(symptoms), None
+
 @app.route('/api/symptom-check', methods=['POST'])
 def get_symptom_advice():
-    data = request.get_json()
-    animal_type = data.get('animal_type')
-    symptoms = data.get('symptoms', [])
-    if not symptoms: return jsonify({"error": "No symptoms provided"}), 400
-    
-    source_data = {}
-    # UPDATED: Point to the new data dictionaries
-    if animal_type == 'puppy':
-        source_data = PUPPY_SYMPTOM_DATA
-    elif animal_type == 'adult_dog':
-        source_data = ADULT_DOG_SYMPTOM_DATA
-    elif animal_type == 'cat':
-        source_data = CAT_SYMPTOM_DATA
-    else:
-        return jsonify({"error": "Invalid animal type"}), 400
-    
-    all_diagnoses, all_actions = set(), set()
-    highest_severity, severity_map = "Mild", {"Mild": 1, "Moderate": 2, "Severe": 3, "Potentially Severe": 3, "Significant": 3}
-
-    for symptom in symptoms:
-        symptom_info = source_data.get(symptom)
-        if symptom_info:
-            all_diagnoses.update(symptom_info["probable_diagnoses"])
-            all_actions.add(symptom_info["course_of_action"])
-            current_severity = symptom_info.get("severity", "Mild").split(' ')[0]
-            if severity_map.get(current_severity, 1) > severity_map.get(highest_severity, 1):
-                highest_severity = current_severity
-    
-    combined_actions = " ".join(all_actions)
-    if len(symptoms) > 1:
-        combined_actions += " Given the combination of symptoms, a veterinary consultation is strongly recommended to get an accurate diagnosis."
+    result, error = check_symptoms(request.get_json(silent=True) or {})
+    if error: return jsonify({"error": error}), 400
+    return jsonify(result)
 
-    return jsonify({"severity": highest_severity, "probable_diagnoses": list(all_diagnoses), "course_of_action": combined_actions})
+@app.route('/api/symptom-check/batch', methods=['POST'])
+def get_symptom_advice_batch():
+    # {"checks": [{"animal_type": ..., "symptoms": [...]}, ...]} -> {"results": [...]} in the same order;
+    # a bad check gets {"error": ...} in its slot instead of failing the whole batch.
+    body = request.get_json(silent=True)
+    checks = body.get('checks') if isinstance(body, dict) else None
+    if not isinstance(checks, list) or not checks: return jsonify({"error": "No checks provided"}), 400
+    if len(checks) > SYMPTOM_BATCH_MAX_CHECKS:
+        return jsonify({"error": f"At most {SYMPTOM_BATCH_MAX_CHECKS} checks per batch"}), 400
+    results = []
+    for check in checks:
+        result, error = check_symptoms(check)
+        results.append({"error": error} if error else result)
+    return jsonify({"results": results})
 
 # (The rest of the Pet API endpoints are unchanged)
 @app.route('/api/pets', methods=['GET'])
-def get_pets(): return jsonify(load_data())
+def get_pets():
+    # ?bbox=west,south,east,north (Leaflet's toBBoxString order) or ?near=lat,lng&radius_km=,
+    # plus optional status=, submitted_after=, submitted_before= (epoch ms) filters.
+    # limit=/cursor= switch to {"pets": [...], "next_cursor": ...} pages ordered by
+    # submissionTime (order=desc for newest first); format=ndjson (or Accept: application/x-ndjson) streams one pet per line.
+    # Read the revision first: anything written after it is replayed by the change feed.
+    rev = pet_store.revision()
+    ndjson = request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson'
+    etag = f"{rev}-{zlib.crc32(request.query_string):08x}{'-nd' if ndjson else ''}"
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        try: query = parse_pet_query(request.args)
+        except ValueError as e: return jsonify({"error": str(e)}), 400
+        if ndjson:
+            response = Response(iter_ndjson(query), mimetype='application/x-ndjson')
+        elif query['limit']:
+            pets = list(islice(iter_pets(query), query['limit']))
+            next_cursor = encode_cursor(pets[-1]) if len(pets) == query['limit'] else None
+            response = jsonify({"pets": pets, "next_cursor": next_cursor})
+        else:
+            response = jsonify({pet['id']: pet for pet in iter_pets(query)})
+
+    response.set_etag(etag)
+    response.headers['X-Pets-Revision'] = str(rev)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept')
+    return response
+
+@app.route('/api/pets/clusters', methods=['GET'])
+def get_pet_clusters():
+    # ?bbox=west,south,east,north&zoom=<Leaflet zoom> -> [{"count", "latlng", "newest"}, ...]
+    # over pets still lost; found pets are not counted, matching the map legend.
+    rev = pet_store.revision()
+    etag = f"{rev}-{zlib.crc32(request.query_string):08x}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        if 'bbox' not in request.args or 'zoom' not in request.args:
+            return jsonify({"error": "bbox and zoom parameters are required"}), 400
+        try:
+            bbox = parse_bbox(request.args['bbox'])
+            zoom = int(request.args['zoom'])
+        except ValueError:
+            return jsonify({"error": "Invalid bbox or zoom parameters"}), 400
+        response = jsonify(pet_store.clusters(*bbox, zoom))
+    response.set_etag(etag)
+    response.headers['X-Pets-Revision'] = str(rev)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/pets/changes', methods=['GET'])
+def get_pet_changes():
+    since = request.args.get('since', type=int)
+    if since is None: return jsonify({"error": "Missing or invalid since parameter"}), 400
+    rev, changes = pet_store.changes_since(since)
+    if changes is None: return jsonify({"rev": rev, "resync": True})
+    return jsonify({"rev": rev, "changes": changes})
+
+@app.route('/api/pets/stream', methods=['GET'])
+def stream_pet_changes():
+    # Server-Sent Events: one "change" event per write, "resync" when the client fell too far behind.
+    since = request.headers.get('Last-Event-ID', request.args.get('since'))
+    try: since = int(since)
+    except (TypeError, ValueError): return jsonify({"error": "Missing or invalid since parameter"}), 400
+    if not change_stream_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many open change streams, poll /api/pets/changes instead"}), 503
+
+    def events(since):
+        yield f"retry: {CHANGE_STREAM_POLL_SECONDS * 1000}\n\n"
+        deadline = time.monotonic() + CHANGE_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            rev, changes = pet_store.changes_since(since)
+            if changes is None:
+                yield f"id: {rev}\nevent: resync\ndata: {json.dumps({'rev': rev})}\n\n"
+                return
+            for change in changes:
+                yield f"id: {change['rev']}\nevent: change\ndata: {json.dumps(change)}\n\n"
+            since = rev
+            if not changes: yield ": keep-alive\n\n"
+            time.sleep(CHANGE_STREAM_POLL_SECONDS)
+
+    response = Response(events(since), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(change_stream_slots.release)
+    return response
 
 @app.route('/api/pets', methods=['POST'])
 def add_pet():
-    pets = load_data()
+    # Everything is validated before the photo is stored, so a rejected report leaves no file behind.
     file = request.files.get('pet_image')
     if not file or file.filename == '': return jsonify({"error": "No image file provided"}), 400
+    try: latlng = [float(request.form['latitude']), float(request.form['longitude'])]
+    except (KeyError, ValueError): return jsonify({"error": "latitude and longitude are required"}), 400
+    if not valid_latlng(*latlng): return jsonify({"error": "latitude/longitude out of range"}), 400
+    try:
+        name, contact, description = (request.form[k] for k in ('pet_name', 'contact', 'description'))
+        submission_time = int(request.form['submissionTime'])
+    except (KeyError, ValueError):
+        return jsonify({"error": "pet_name, contact, description and submissionTime are required"}), 400
     
-    filename = secure_filename(file.filename)
-    unique_filename = str(int(float(request.form['submissionTime']) / 1000)) + '_' + filename
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-    file.save(file_path)
+    image_url = image_store.save(file.stream)
+    if not image_url: return jsonify({"error": "Image must be a JPEG, PNG, GIF or WebP file"}), 400
     
     pet_id = 'pet_' + request.form['submissionTime']
     new_pet_data = {
-        "id": pet_id, "name": request.form['pet_name'], "contact": request.form['contact'],
-        "description": request.form['description'], "imageUrl": '/' + file_path,
-        "latlng": [float(request.form['latitude']), float(request.form['longitude'])],
-        "submissionTime": int(request.form['submissionTime']), "status": 'not-found',
+        "id": pet_id, "name": name, "contact": contact,
+        "description": description, "imageUrl": image_url,
+        "latlng": latlng,
+        "submissionTime": submission_time, "status": 'not-found',
     }
-    pets[pet_id] = new_pet_data
-    save_data(pets)
+    try:
+        pet_store.put(new_pet_data)
+    except BaseException:
+        image_store.release(image_url)  # reaped unless another pet shares the same photo
+        raise
     return jsonify(new_pet_data), 201
 
 @app.route('/api/pets/<pet_id>/status', methods=['POST'])
 def update_pet_status(pet_id):
-    pets = load_data()
-    if pet_id in pets:
-        pets[pet_id]['status'] = 'found' if pets[pet_id]['status'] == 'not-found' else 'not-found'
-        save_data(pets)
-        return jsonify(pets[pet_id])
+    pet = pet_store.toggle_status(pet_id)
+    if pet: return jsonify(pet)
+    return jsonify({"error": "Pet not found"}), 404
+
+@app.route('/api/pets/<pet_id>/sightings', methods=['GET'])
+def get_pet_sightings(pet_id):
+    pet = pet_store.get(pet_id)
+    if pet: return jsonify(pet.get('sightings', []))
+    return jsonify({"error": "Pet not found"}), 404
+
+@app.route('/api/pets/<pet_id>/sightings', methods=['POST'])
+def add_pet_sighting(pet_id):
+    # kind is 'sighted' (green pin) or 'searched' (yellow pin)
+    data = request.get_json(silent=True) or {}
+    try: latlng = [float(data['latitude']), float(data['longitude'])]
+    except (KeyError, TypeError, ValueError): return jsonify({"error": "latitude and longitude are required"}), 400
+    if not valid_latlng(*latlng): return jsonify({"error": "latitude/longitude out of range"}), 400
+    if data.get('kind') not in SIGHTING_KINDS: return jsonify({"error": "kind must be 'sighted' or 'searched'"}), 400
+
+    sighting = pet_store.add_sighting(pet_id, {"kind": data['kind'], "latlng": latlng, "time": int(time.time() * 1000)})
+    if sighting: return jsonify(sighting), 201
     return jsonify({"error": "Pet not found"}), 404
 
 @app.route('/api/pets/<pet_id>', methods=['DELETE'])
 def delete_pet(pet_id):
-    pets = load_data()
-    if pet_id in pets:
-        try:
-            image_path = pets[pet_id]['imageUrl'].lstrip('/')
-            if os.path.exists(image_path): os.remove(image_path)
-        except Exception as e:
-            print(f"Error deleting image file: {e}")
-        del pets[pet_id]
-        save_data(pets)
+    pet = pet_store.delete(pet_id)
+    if pet:
+        image_store.release(pet['imageUrl'])  # unlinked later by the reaper if no other pet uses it
         return jsonify({"success": True}), 200
-    return jsonify({"error": "Pet not found"}), 404
\ No newline at end of file
+    return jsonify({"error": "Pet not found"}), 404
+
+@app.route('/uploads/<name>')
+def uploaded_image(name):
+    # Content-addressed, so the hash doubles as a strong ETag; send_from_directory
+    # handles If-None-Match/If-Modified-Since and Range requests. Only stored
+    # images are served, never the lock file or an upload still being written.
+    if not image_store.is_stored_name(name): abort(404)
+    response = send_from_directory(image_store.folder, name, etag=name.split('.')[0], max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"error": f"Upload exceeds {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB"}), 413
@@ -0,0 +1,219 @@
+"""Synthetic-load benchmarks for the PetHelp routes.
+
+    python benchmarks/bench_routes.py --sizes 1000,10000,100000 --workers 4
+    python benchmarks/bench_routes.py --sizes 1000000 --scenarios get_pets_bbox,add_pet
+    python benchmarks/bench_routes.py --baseline old.json --threshold 0.2   # exit 1 on p95 regressions
+
+For every dataset size a data.json-shaped file of fake reports, clustered
+around app.CENTRAL_LOCATIONS, is written to a fresh temp directory. The app is
+then imported there by worker processes, so the pet store migrates it exactly
+as it would in production. Each scenario first runs in a single worker and
+then in --workers processes at once against the same store, through the Flask
+test client. Latency percentiles, throughput and peak RSS go to stdout and
+to --output as JSON.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+TINY_PNG = b'\x89PNG\r\n\x1a\n' + bytes(64)
+
+# --- Synthetic data ---
+def generate_pets(count, seed=0):
+    from app import CENTRAL_LOCATIONS
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    pets = {}
+    for i in range(count):
+        lat, lng = rng.choice(CENTRAL_LOCATIONS)["coords"]
+        submitted = now_ms - rng.randrange(90 * 24 * 3600 * 1000) - i  # -i keeps ids unique
+        pet_id = f"pet_{submitted}"
+        pets[pet_id] = {
+            "id": pet_id, "name": f"Pet {i}", "contact": f"0300-{i:07d}",
+            "description": "Brown, friendly, answers to her name.",
+            "imageUrl": f"/uploads/{rng.getrandbits(256):064x}.jpg",
+            "latlng": [rng.gauss(lat, 0.015), rng.gauss(lng, 0.015)],
+            "submissionTime": submitted, "status": rng.choice(['not-found', 'not-found', 'found']),
+        }
+    return pets
+
+def symptom_corpus(size, seed=0):
+    from app import SYMPTOM_RULES, PUPPY_SYMPTOM_DATA, ADULT_DOG_SYMPTOM_DATA, CAT_SYMPTOM_DATA
+    tables = {'puppy': PUPPY_SYMPTOM_DATA, 'adult_dog': ADULT_DOG_SYMPTOM_DATA, 'cat': CAT_SYMPTOM_DATA}
+    assert set(tables) == set(SYMPTOM_RULES)
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        animal_type = rng.choice(list(tables))
+        symptoms = list(tables[animal_type])
+        corpus.append({"animal_type": animal_type, "symptoms": rng.sample(symptoms, rng.randint(1, len(symptoms)))})
+    return corpus
+
+def prepare_workdir(count, seed):
+    workdir = tempfile.mkdtemp(prefix=f'pethelp-bench-{count}-')
+    os.makedirs(os.path.join(workdir, 'static', 'uploads'))
+    with open(os.path.join(workdir, 'data.json'), 'w') as f:
+        json.dump(generate_pets(count, seed), f)
+    return workdir
+
+
+# --- Scenarios: one request each, returning the status code ---
+def random_bbox(rng, span=0.02):
+    from app import CENTRAL_LOCATIONS
+    lat, lng = rng.choice(CENTRAL_LOCATIONS)["coords"]
+    return f"{lng - span},{lat - span},{lng + span},{lat + span}"
+
+def add_pet(client, rng, ctx):
+    ctx['next_time'] += 1
+    lat, lng = 31.5 + rng.uniform(-0.1, 0.1), 74.3 + rng.uniform(-0.1, 0.1)
+    return client.post('/api/pets', data={
+        'pet_image': (io.BytesIO(TINY_PNG + rng.randbytes(16)), 'pet.png'), 'pet_name': 'Bench', 'contact': '0300',
+        'description': 'benchmark', 'latitude': str(lat), 'longitude': str(lng), 'submissionTime': str(ctx['next_time']),
+    }).status_code
+
+def delete_pet(client, rng, ctx):
+    pet_id = ctx['ids'].pop() if ctx['ids'] else 'pet_missing'
+    return client.delete(f'/api/pets/{pet_id}').status_code
+
+SCENARIOS = {
+    'get_pets_all': lambda client, rng, ctx: client.get('/api/pets').status_code,
+    'get_pets_bbox': lambda client, rng, ctx: client.get(f'/api/pets?bbox={random_bbox(rng)}').status_code,
+    'get_pets_page': lambda client, rng, ctx: client.get('/api/pets?limit=100&status=not-found').status_code,
+    'get_pets_clusters': lambda client, rng, ctx: client.get(f'/api/pets/clusters?bbox={random_bbox(rng, 0.3)}&zoom=11').status_code,
+    'add_pet': add_pet,
+    'update_pet_status': lambda client, rng, ctx: client.post(f"/api/pets/{rng.choice(ctx['ids'])}/status").status_code,
+    'get_symptom_advice': lambda client, rng, ctx: client.post('/api/symptom-check', json=rng.choice(ctx['symptoms'])).status_code,
+    'get_symptom_advice_batch': lambda client, rng, ctx: client.post('/api/symptom-check/batch', json={"checks": rng.sample(ctx['symptoms'], 20)}).status_code,
+    'page_home': lambda client, rng, ctx: client.get('/').status_code,
+    'page_symptom_checker': lambda client, rng, ctx: client.get('/symptom-checker').status_code,
+    'page_lost_pet_map': lambda client, rng, ctx: client.get('/lost-pet-map').status_code,
+    'page_wip': lambda client, rng, ctx: client.get('/wip').status_code,
+    'delete_pet': delete_pet,  # last: it shrinks the dataset
+}
+
+
+# --- Worker processes ---
+_worker = {}
+
+def _init_worker(workdir, seed):
+    os.chdir(workdir)
+    import app
+    rng = random.Random(seed ^ os.getpid())
+    ids = list(app.pet_store.all())
+    rng.shuffle(ids)
+    _worker.update(client=app.app.test_client(), rng=rng, ctx={
+        'ids': ids, 'symptoms': symptom_corpus(500, seed),
+        'next_time': int(time.time() * 1000) * 1000 + os.getpid() * 10 ** 6,  # disjoint per worker
+    })
+
+def _warm_up(_):
+    time.sleep(0.2)  # lets every pool process finish _init_worker before timing starts
+    return os.getpid()
+
+def _run_scenario(task):
+    name, requests = task
+    client, rng, ctx = _worker['client'], _worker['rng'], _worker['ctx']
+    run = SCENARIOS[name]
+    latencies, errors = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        status = run(client, rng, ctx)
+        latencies.append(time.perf_counter() - start)
+        if status >= 400: errors += 1
+    return latencies, errors, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def percentile(sorted_values, pct):
+    if not sorted_values: return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+def run_mode(workdir, names, requests, workers, seed):
+    results = {}
+    with multiprocessing.get_context('spawn').Pool(workers, _init_worker, (workdir, seed)) as pool:
+        pool.map(_warm_up, range(workers), chunksize=1)
+        for name in names:
+            per_worker = max(1, requests // workers)
+            start = time.perf_counter()
+            outcomes = pool.map(_run_scenario, [(name, per_worker)] * workers, chunksize=1)
+            wall = time.perf_counter() - start
+            latencies = sorted(l for lats, _, _ in outcomes for l in lats)
+            results[name] = {
+                "requests": len(latencies), "errors": sum(e for _, e, _ in outcomes),
+                "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000, "throughput_rps": len(latencies) / wall,
+                "peak_rss_kb": max(rss for _, _, rss in outcomes),  # ru_maxrss is KiB on Linux
+            }
+    return results
+
+
+# --- Reporting ---
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for size, modes in results.items():
+        for mode, scenarios in modes.items():
+            for name, stats in scenarios.items():
+                old = baseline.get(size, {}).get(mode, {}).get(name)
+                if old and stats["p95_ms"] > old["p95_ms"] * (1 + threshold):
+                    regressions.append(f"{size} {mode} {name}: p95 {old['p95_ms']:.2f} -> {stats['p95_ms']:.2f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000', help='comma-separated dataset sizes (up to 1000000)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated subset of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario and mode')
+    parser.add_argument('--workers', type=int, default=4, help='processes for the concurrent run (0 to skip it)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='earlier --output file to compare p95 latencies against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 slowdown vs baseline (0.2 = 20%%)')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # Importing app opens a pet store in the working directory; keep the
+    # parent's (used for CENTRAL_LOCATIONS and the symptom tables) out of the repo.
+    scratch = tempfile.mkdtemp(prefix='pethelp-bench-')
+    os.chdir(scratch)
+
+    names = [n for n in SCENARIOS if n in args.scenarios.split(',')]
+    results = {}
+    for size in (int(s) for s in args.sizes.split(',')):
+        workdir = prepare_workdir(size, args.seed)
+        try:
+            modes = {"single": run_mode(workdir, names, args.requests, 1, args.seed)}
+            if args.workers > 1:
+                modes[f"concurrent_{args.workers}"] = run_mode(workdir, names, args.requests, args.workers, args.seed)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results[str(size)] = modes
+        for mode, scenarios in modes.items():
+            print(f"\n{size} pets, {mode}")
+            print(f"  {'scenario':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}{'errors':>8}{'rss MiB':>9}")
+            for name, s in scenarios.items():
+                print(f"  {name:<26}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+                      f"{s['throughput_rps']:>10.0f}{s['errors']:>8}{s['peak_rss_kb'] / 1024:>9.0f}")
+
+    shutil.rmtree(scratch, ignore_errors=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"\nResults written to {output}")
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.threshold)
+        for line in regressions: print("REGRESSION", line)
+        if regressions: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import queue
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from metrics import registry, span
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process, thread lock only
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+STORED_NAME = re.compile(r'[0-9a-f]{64}\.(jpg|png|gif|webp)')  # what save() produces
+TEMP_PREFIX = '.upload-'
+
+# Leading bytes of the image formats we accept -> file extension.
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+
+
+def sniff_image_type(head):
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature): return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP': return 'webp'
+    return None
+
+
+# --- Content-addressed image storage ---
+# Uploads are streamed to a temp file while being hashed and then renamed to
+# <sha256>.<ext>, so identical photos share one file and a stored file never
+# changes under its name. Files are not reference counted on disk: the pet
+# store already knows which pets point at which imageUrl, and release() hands
+# unreferenced files to a background reaper so requests never wait on unlink.
+# Storing a duplicate and reaping a file both run under a lock on the folder,
+# so a reap never deletes a file another upload has just claimed. Pending reaps
+# live in process memory and are lost when a worker exits, so sweep() re-queues
+# every stored file at startup and the reaper drops whichever are unreferenced.
+class ImageStore:
+    def __init__(self, folder, url_prefix, is_referenced, grace_seconds=60):
+        self.folder = os.path.abspath(folder)
+        self.url_prefix = url_prefix.rstrip('/')
+        self.is_referenced = is_referenced
+        self.grace_seconds = grace_seconds
+        self.lock_path = os.path.join(self.folder, '.reap.lock')
+        os.makedirs(folder, exist_ok=True)
+
+        self._reap_queue = queue.Queue()
+        self._reaper = None
+        self._reaper_lock = threading.Lock()
+        self._folder_mutex = threading.Lock()
+
+    @contextmanager
+    def _folder_locked(self):
+        with self._folder_mutex, open(self.lock_path, 'a') as lock_file:
+            if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl: fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self, stream):
+        # Returns the image URL, or None if the stream is not a supported image.
+        head = stream.read(12)
+        ext = sniff_image_type(head)
+        if ext is None: return None
+
+        digest = hashlib.sha256(head)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=TEMP_PREFIX)
+        try:
+            with span("upload_write"), os.fdopen(fd, 'wb') as f:
+                f.write(head)
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+            name = f"{digest.hexdigest()}.{ext}"
+            path = os.path.join(self.folder, name)
+            with self._folder_locked():
+                if os.path.exists(path):
+                    # Duplicate photo: keep the stored copy, but refresh its mtime so
+                    # a pending reap of the same file waits out another grace period.
+                    os.remove(tmp_path)
+                    os.utime(path)
+                else:
+                    os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+        return f"{self.url_prefix}/{name}"
+
+    def is_stored_name(self, name):
+        return STORED_NAME.fullmatch(name) is not None
+
+    def sweep(self):
+        # Hands every stored image to the reaper and deletes temp files left by
+        # uploads that died mid-write. Legacy (non-hashed) files are left alone.
+        for name in os.listdir(self.folder):
+            if self.is_stored_name(name):
+                self.release(f"{self.url_prefix}/{name}")
+            elif name.startswith(TEMP_PREFIX):
+                try:
+                    if time.time() - os.path.getmtime(os.path.join(self.folder, name)) > self.grace_seconds:
+                        os.remove(os.path.join(self.folder, name))
+                except FileNotFoundError:
+                    pass
+
+    def path_for(self, url):
+        # Legacy /static/uploads/<name> URLs live in the same folder.
+        return os.path.join(self.folder, os.path.basename(url))
+
+    def release(self, url):
+        self._reap_queue.put((time.monotonic() + self.grace_seconds, url))
+        with self._reaper_lock:
+            if self._reaper is None or not self._reaper.is_alive():
+                self._reaper = threading.Thread(target=self._reap_forever, daemon=True)
+                self._reaper.start()
+
+    def _reap_forever(self):
+        while True:
+            due, url = self._reap_queue.get()
+            time.sleep(max(0, due - time.monotonic()))
+            try:
+                self._reap(url)
+            except OSError:
+                registry.inc("pethelp_image_reap_errors_total")
+                log.exception("Error deleting image file for %s", url)
+
+    def _reap(self, url):
+        path = self.path_for(url)
+        with self._folder_locked():
+            if self.is_referenced(url): return
+            try:
+                if time.time() - os.path.getmtime(path) < self.grace_seconds:
+                    self._reap_queue.put((time.monotonic() + self.grace_seconds, url))
+                    return
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process, thread lock only
+    fcntl = None
+
+EXITED_FILE = 'exited.json'  # summed counters and histograms of workers that have exited
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# --- Process-local registry ---
+# Counters, gauges and histograms keyed by metric name and a sorted tuple of
+# label pairs. With a shared directory configured, every worker writes its
+# snapshot to <dir>/<pid>.json once a second and /metrics sums all of them,
+# so any gunicorn worker can answer a scrape. Gauges are only summed over
+# workers that are still alive. Counters and histograms of exited workers are
+# folded into <dir>/exited.json and their snapshot deleted, so totals never go
+# backwards and a recycled pid cannot overwrite them.
+class Registry:
+    def __init__(self, shared_dir=None, flush_interval=1.0):
+        self.shared_dir = shared_dir
+        self.flush_interval = flush_interval
+        self._metrics = {}   # name -> {"kind", "help", "buckets", "samples": {labels: value}}
+        self._lock = threading.Lock()
+        self._lock_dir_mutex = threading.Lock()
+        self._flusher_pid = None
+        self._snapshot_pid = None  # pid whose snapshot file this process has taken over
+
+    def _declare(self, kind, name, description, buckets=None):
+        self._metrics[name] = {"kind": kind, "help": description, "buckets": buckets, "samples": {}}
+
+    def counter(self, name, description): self._declare("counter", name, description)
+    def gauge(self, name, description): self._declare("gauge", name, description)
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS): self._declare("histogram", name, description, list(buckets))
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._metrics[name]["samples"]
+            samples[key] = samples.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self._metrics[name]
+            # [per-bucket counts..., sum, count]; buckets are made cumulative on export
+            sample = metric["samples"].setdefault(key, [0] * len(metric["buckets"]) + [0.0, 0])
+            for i, bound in enumerate(metric["buckets"]):
+                if value <= bound:
+                    sample[i] += 1
+                    break
+            sample[-2] += value
+            sample[-1] += 1
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("pethelp_span_duration_seconds", time.perf_counter() - start, span=name)
+
+    # --- Cross-worker aggregation ---
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(m, samples=[[list(map(list, k)), v] for k, v in m["samples"].items()])
+                    for name, m in self._metrics.items()}
+
+    def flush(self):
+        if not self.shared_dir: return
+        os.makedirs(self.shared_dir, exist_ok=True)
+        path = os.path.join(self.shared_dir, f"{os.getpid()}.json")
+        if self._snapshot_pid != os.getpid():
+            # A file under our pid left by an exited worker is still owed to the totals.
+            self._retire(path)
+            self._snapshot_pid = os.getpid()
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def ensure_flusher(self):
+        # Started lazily per process so it also runs in workers forked after import.
+        if not self.shared_dir or self._flusher_pid == os.getpid(): return
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_forever, daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    @contextmanager
+    def _dir_locked(self):
+        with self._lock_dir_mutex, open(os.path.join(self.shared_dir, '.lock'), 'a') as lock_file:
+            if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl: fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _retire(self, path, pid=None):
+        # Folds a snapshot's counters and histograms into exited.json and deletes
+        # it. With a pid, only if that process is still gone once we hold the lock.
+        exited_path = os.path.join(self.shared_dir, EXITED_FILE)
+        with self._dir_locked():
+            if pid is not None and pid_alive(pid): return
+            snapshot = read_snapshot(path)
+            if snapshot is None: return
+            merged = {}
+            merge_snapshot(merged, read_snapshot(exited_path) or {})
+            merge_snapshot(merged, snapshot, gauges=False)
+            with open(exited_path + '.tmp', 'w') as f:
+                json.dump(as_snapshot(merged), f)
+            os.replace(exited_path + '.tmp', exited_path)
+            os.remove(path)
+
+    def collect(self):
+        # Returns this process's metrics merged with every other worker's last
+        # snapshot and the totals of workers that have exited.
+        if not self.shared_dir: return self.snapshot()
+        self.flush()
+        merged = {}
+        for filename in os.listdir(self.shared_dir):
+            if not filename.endswith('.json') or filename == EXITED_FILE: continue
+            pid, path = int(filename[:-len('.json')]), os.path.join(self.shared_dir, filename)
+            if pid_alive(pid): merge_snapshot(merged, read_snapshot(path) or {})
+            else: self._retire(path, pid)
+        merge_snapshot(merged, read_snapshot(os.path.join(self.shared_dir, EXITED_FILE)) or {})
+        return as_snapshot(merged)
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4.
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            for labels, value in metric["samples"]:
+                if metric["kind"] != "histogram":
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric["buckets"], value[:-2]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(labels + [['le', str(bound)]])} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(labels + [['le', '+Inf']])} {value[-1]}")
+                lines.append(f"{name}_sum{format_labels(labels)} {value[-2]}")
+                lines.append(f"{name}_count{format_labels(labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        return {}
+
+def merge_snapshot(merged, snapshot, gauges=True):
+    # Sums a snapshot into merged ({name: metric with samples as {labels: value}}).
+    for name, metric in snapshot.items():
+        if metric["kind"] == "gauge" and not gauges: continue
+        target = merged.setdefault(name, dict(metric, samples={}))["samples"]
+        for labels, value in metric["samples"]:
+            key = tuple(map(tuple, labels))
+            if key not in target: target[key] = value
+            elif isinstance(value, list): target[key] = [a + b for a, b in zip(target[key], value)]
+            else: target[key] += value
+
+def as_snapshot(merged):
+    return {name: dict(metric, samples=[[list(map(list, k)), v] for k, v in metric["samples"].items()])
+            for name, metric in merged.items()}
+
+def format_labels(labels):
+    if not labels: return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+registry = Registry(shared_dir=os.environ.get('PETHELP_METRICS_DIR', 'metrics.d'))
+registry.counter("pethelp_http_requests_total", "HTTP requests by route, method and status code.")
+registry.histogram("pethelp_http_request_duration_seconds", "Time until response headers, by route and method.")
+registry.gauge("pethelp_http_requests_in_flight", "Requests currently being handled, by route.")
+registry.histogram("pethelp_span_duration_seconds", "Time spent in internal hot spots, by span.")
+registry.counter("pethelp_image_reap_errors_total", "Failed deletions of unreferenced upload files.")
+span = registry.span
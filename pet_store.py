@@ -0,0 +1,416 @@
+import os
+import json
+import math
+import heapq
+import bisect
+import tempfile
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from spatial_index import ClusterIndex, GridIndex, haversine_km, valid_latlng
+from metrics import span
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process, thread lock only
+    fcntl = None
+
+
+# --- Append-only pet store ---
+# Every write appends one JSON line to the log ({"op": "put", "rev": n, "pet": {...}},
+# {"op": "del", "rev": n, "id": ...} or {"op": "sight", "rev": n, "id": ..., "sighting": {...}}), so a status toggle or delete costs one
+# small write instead of re-serializing every pet. Each worker keeps an in-memory id index
+# and replays whatever other workers appended since its last read. A flock on a
+# side file serializes writers across gunicorn workers, and compaction swaps a
+# fresh log in with os.replace so readers never see a half-written file.
+#
+# Revisions are assigned under the exclusive lock, so they increase across all
+# workers. A compacted log starts with {"op": "rev", "rev": n, "gen": ...}
+# followed by the live pets without revisions; only records newer than what a
+# worker has already seen go into its change feed. The random "gen" makes every
+# rewritten log distinguishable even if the filesystem reuses the old inode.
+class PetStore:
+    def __init__(self, log_path, legacy_path=None, compact_min_records=1000, compact_ratio=2.0, feed_size=1000):
+        self.log_path = log_path
+        self.lock_path = log_path + '.lock'
+        self.compact_lock_path = log_path + '.compact.lock'
+        self.legacy_path = legacy_path
+        self.compact_min_records = compact_min_records
+        self.compact_ratio = compact_ratio
+
+        self._pets = {}
+        self._geo = GridIndex()  # latlng index over self._pets, updated by _apply
+        self._clusters = ClusterIndex()  # per-zoom aggregates over the pets still lost
+        self._by_time = []       # sorted (submissionTime, id) keys over self._pets
+        self._reloading = False  # full replay in progress: _by_time is rebuilt once at the end
+        self._image_refs = Counter()  # imageUrl -> number of pets using it
+        self._offset = 0        # bytes of the log already applied to self._pets
+        self._inode = None      # changes when another worker compacts the log
+        self._header = None     # first line of the log, carries the generation
+        self._seen_stat = None  # (inode, size, mtime) of the log at the last catch-up
+        self._records = 0       # lines in the log, live or superseded
+        self._rev = 0           # newest revision applied, survives compaction resets
+        self._feed = deque(maxlen=feed_size)  # recent changes, oldest first
+        self._feed_floor = 0    # changes at or below this revision are not in the feed
+        self._mutex = threading.RLock()
+        self._compacting = False
+
+        if not os.path.exists(self.log_path):
+            with self._locked(exclusive=True):
+                pass  # creates the log, migrating the legacy file if there is one
+        with self._locked(exclusive=False):
+            pass
+
+    # --- Locking & replay ---
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._mutex:
+            # Replay what is already on disk before taking the file lock, so a
+            # worker loading a whole log (at boot, or after another worker
+            # compacted) never holds up writers in other processes; under the
+            # lock only records appended in the meantime are left. If a
+            # compaction lands in between, the locked pass reloads once more.
+            self._catch_up(exclusive=False)
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    if exclusive and not os.path.exists(self.log_path):
+                        self._migrate_legacy()
+                    self._catch_up(exclusive)
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _migrate_legacy(self):
+        pets = {}
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, 'r') as f:
+                try: pets = json.load(f)
+                except json.JSONDecodeError: pets = {}
+        os.replace(self._write_log(pets.values(), self._rev), self.log_path)
+
+    def _write_log(self, pets, rev):
+        # Writes a fresh log to a temp file next to the real one and returns its
+        # path; the name is unique per call, so concurrent writers never share it.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.log_path)),
+                                        prefix=os.path.basename(self.log_path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._encode({"op": "rev", "rev": rev, "gen": os.urandom(8).hex()}))
+                for pet in pets:
+                    f.write(self._encode({"op": "put", "pet": pet}))
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def _catch_up(self, exclusive):
+        # Safe without the file lock: appends only ever complete a line before
+        # the next one starts and compaction swaps in a whole new file, so the
+        # complete lines of whichever file we opened are always consistent.
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return
+        if (stat.st_ino, stat.st_size, stat.st_mtime_ns) == self._seen_stat:
+            return
+
+        with open(self.log_path, 'rb') as f:
+            stat = os.fstat(f.fileno())  # the file we opened, even if it was just replaced
+            header = f.readline()
+            self._reloading = stat.st_ino != self._inode or header != self._header or stat.st_size < self._offset
+            if self._reloading:
+                self._pets, self._offset, self._records = {}, 0, 0
+                self._geo.clear()
+                self._clusters.clear()
+                self._by_time = []
+                self._image_refs.clear()
+                self._inode, self._header = stat.st_ino, header
+            chunk, end = b'', 0
+            try:
+                if stat.st_size > self._offset:
+                    with span("pet_store_load"):
+                        f.seek(self._offset)
+                        chunk = f.read(stat.st_size - self._offset)
+                        end = chunk.rfind(b'\n') + 1
+                        for line in chunk[:end].splitlines():
+                            if line.strip():
+                                self._apply(json.loads(line))
+                        self._offset += end
+            finally:
+                if self._reloading:
+                    # One sort instead of an insort per replayed record.
+                    self._by_time = sorted(time_key(pet) for pet in self._pets.values())
+                    self._reloading = False
+
+        # A worker killed mid-append leaves a partial last line; drop it before
+        # anyone appends after it. Only safe while holding the exclusive lock.
+        if exclusive and end < len(chunk):
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(self._offset)
+            stat = os.stat(self.log_path)
+        self._seen_stat = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _apply(self, record):
+        self._records += 1
+        rev = record.get("rev", 0)
+        if record["op"] == "rev":
+            # Header of a log compacted elsewhere: anything between our last
+            # revision and this one was folded into the snapshot.
+            if rev > self._rev: self._feed_floor, self._rev = rev, rev
+            return
+
+        change = None
+        if record["op"] == "put":
+            pet = record["pet"]
+            old = self._pets.get(pet["id"])
+            change = {"rev": rev, "op": "update" if old else "add", "id": pet["id"], "pet": pet}
+            if old: self._unindex(old)
+            if not self._reloading: bisect.insort(self._by_time, time_key(pet))
+            self._image_refs[pet.get("imageUrl")] += 1
+            self._pets[pet["id"]] = pet
+            if pet.get("latlng"):
+                self._geo.insert(pet["id"], *pet["latlng"])
+            else:
+                self._geo.remove(pet["id"])
+            if pet.get("latlng") and pet.get("status") != "found":
+                self._clusters.insert(pet["id"], *pet["latlng"], pet.get("submissionTime", 0))
+            else:
+                self._clusters.remove(pet["id"])
+        elif record["op"] == "del":
+            change = {"rev": rev, "op": "delete", "id": record["id"]}
+            old = self._pets.pop(record["id"], None)
+            if old: self._unindex(old)
+            self._geo.remove(record["id"])
+            self._clusters.remove(record["id"])
+        elif record["op"] == "sight":
+            pet = self._pets.get(record["id"])
+            if pet:
+                self._pets[pet["id"]] = dict(pet, sightings=pet.get("sightings", []) + [record["sighting"]])
+                change = {"rev": rev, "op": "sighting", "id": pet["id"], "sighting": record["sighting"]}
+
+        if change and rev > self._rev:
+            if len(self._feed) == self._feed.maxlen:
+                self._feed_floor = self._feed[0]["rev"]
+            self._feed.append(change)
+            self._rev = rev
+
+    def _unindex(self, pet):
+        # Drop a superseded or deleted pet from the time and image indexes.
+        url = pet.get("imageUrl")
+        self._image_refs[url] -= 1
+        if self._image_refs[url] <= 0: del self._image_refs[url]
+        if self._reloading: return
+        key = time_key(pet)
+        i = bisect.bisect_left(self._by_time, key)
+        if i < len(self._by_time) and self._by_time[i] == key:
+            del self._by_time[i]
+
+    def _append(self, record):
+        # Validated before anything touches the log: a record that _apply would
+        # reject must never be persisted, or every worker fails to replay it.
+        self._validate(record)
+        record["rev"] = self._rev + 1
+        with span("pet_store_dump"):
+            line = self._encode(record)
+            with open(self.log_path, 'ab') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        self._offset += len(line)
+        self._apply(record)
+        self._maybe_compact()
+
+    @staticmethod
+    def _validate(record):
+        if record["op"] == "put": latlng = record["pet"].get("latlng")
+        elif record["op"] == "sight": latlng = record["sighting"].get("latlng")
+        else: return
+        if latlng is not None and not (len(latlng) == 2 and valid_latlng(*latlng)):
+            raise ValueError(f"Invalid latlng {latlng!r}")
+
+    @staticmethod
+    def _encode(record):
+        return (json.dumps(record, separators=(',', ':'), allow_nan=False) + '\n').encode('utf-8')
+
+    # --- Compaction ---
+    def _maybe_compact(self):
+        if self._compacting or self._records < self.compact_min_records:
+            return
+        if self._records < self.compact_ratio * max(len(self._pets), 1):
+            return
+        self._compacting = True
+        threading.Thread(target=self._compact, daemon=True).start()
+
+    def _compact(self):
+        try:
+            # One compaction at a time across all workers: whoever holds the
+            # compact lock does it and everyone else skips. The lock is separate
+            # from the log lock so writers keep appending meanwhile.
+            with open(self.compact_lock_path, 'a') as compact_lock:
+                if fcntl:
+                    try:
+                        fcntl.flock(compact_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return
+                self._compact_locked()
+        finally:
+            self._compacting = False
+
+    def _compact_locked(self):
+        # Snapshot under a shared lock, write it out without the log lock, then
+        # take the exclusive lock only long enough to copy over whatever was
+        # appended meanwhile and swap the files.
+        with self._locked(exclusive=False):
+            snapshot = list(self._pets.values())
+            snapshot_offset, snapshot_header, snapshot_rev = self._offset, self._header, self._rev
+            if self._records < self.compact_ratio * max(len(snapshot), 1):
+                return  # another worker compacted since we decided to
+        with span("pet_store_compact"):
+            tmp_path = self._write_log(snapshot, snapshot_rev)
+
+        try:
+            with self._locked(exclusive=True):
+                if self._header != snapshot_header:
+                    return
+                with open(self.log_path, 'rb') as f:
+                    f.seek(snapshot_offset)
+                    tail = f.read(self._offset - snapshot_offset)
+                with open(tmp_path, 'ab') as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.log_path)
+                self._records = 1 + len(snapshot) + tail.count(b'\n')
+                with open(self.log_path, 'rb') as f:
+                    self._header = f.readline()
+                    stat = os.fstat(f.fileno())
+                self._inode, self._offset, self._seen_stat = stat.st_ino, stat.st_size, None
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+
+    # --- Public API ---
+    def all(self):
+        with self._locked(exclusive=False):
+            return dict(self._pets)
+
+    def revision(self):
+        with self._locked(exclusive=False):
+            return self._rev
+
+    def changes_since(self, since):
+        # Returns (revision, changes), or (revision, None) when `since` is older
+        # than this worker's feed and the client has to refetch everything.
+        with self._locked(exclusive=False):
+            if since < self._feed_floor or since > self._rev:
+                return self._rev, None
+            changes = []
+            for change in reversed(self._feed):
+                if change["rev"] <= since: break
+                changes.append(change)
+            changes.reverse()
+            return self._rev, changes
+
+    def get(self, pet_id):
+        with self._locked(exclusive=False):
+            return self._pets.get(pet_id)
+
+    def image_in_use(self, url):
+        with self._locked(exclusive=False):
+            return self._image_refs[url] > 0
+
+    def by_time(self, after=None, until=None, status=None, limit=100, before=None, descending=False,
+                bbox=None, near=None):
+        # Up to `limit` pets ordered by (submissionTime, id), strictly between the
+        # `after` and `before` keys, submitted no later than `until` and, given a
+        # bbox (south, west, north, east) or near (lat, lng, km), inside that
+        # area; newest first when `descending`.
+        with self._locked(exclusive=False):
+            lo = bisect.bisect_right(self._by_time, after) if after else 0
+            hi = bisect.bisect_left(self._by_time, before) if before else len(self._by_time)
+            if until is not None: hi = min(hi, bisect.bisect_left(self._by_time, (until + 1,)))
+            in_area = area_filter(bbox, near)
+            # With an area, walk the time index only while it keeps paying off:
+            # once about sqrt(n * limit) keys have been looked at, the area holds
+            # few enough pets that taking them from the grid is cheaper. Either
+            # way a page costs O(sqrt(n * limit)), not O(pets in the area).
+            budget = math.isqrt(len(self._by_time) * limit) + limit if in_area else None
+            page = []
+            for scanned, i in enumerate(range(hi - 1, lo - 1, -1) if descending else range(lo, hi)):
+                if scanned == budget:
+                    return self._area_page(lo, hi, status, limit, descending, bbox, near)
+                pet = self._pets[self._by_time[i][1]]
+                if status and pet.get("status") != status: continue
+                if in_area and not in_area(pet): continue
+                page.append(pet)
+                if len(page) == limit: break
+            return page
+
+    def _area_page(self, lo, hi, status, limit, descending, bbox, near):
+        # The by_time page for a sparse area: every pet in it, cut to the index
+        # range [lo, hi) and the first `limit` keys in order.
+        ids = self._geo.query_bbox(*bbox) if bbox else self._geo.query_radius(*near)
+        first, last = self._by_time[lo], self._by_time[hi - 1]
+        keys = (key for key in map(time_key, map(self._pets.__getitem__, ids)) if first <= key <= last)
+        if status: keys = (key for key in keys if self._pets[key[1]].get("status") == status)
+        keys = heapq.nlargest(limit, keys) if descending else heapq.nsmallest(limit, keys)
+        return [self._pets[pet_id] for _, pet_id in keys]
+
+    def clusters(self, south, west, north, east, zoom):
+        with self._locked(exclusive=False):
+            return self._clusters.query(south, west, north, east, zoom)
+
+    def within_bbox(self, south, west, north, east):
+        with self._locked(exclusive=False):
+            return {i: self._pets[i] for i in self._geo.query_bbox(south, west, north, east)}
+
+    def near(self, lat, lng, radius_km):
+        with self._locked(exclusive=False):
+            return {i: self._pets[i] for i in self._geo.query_radius(lat, lng, radius_km)}
+
+    def put(self, pet):
+        with self._locked(exclusive=True):
+            self._append({"op": "put", "pet": pet})
+            return pet
+
+    def toggle_status(self, pet_id):
+        with self._locked(exclusive=True):
+            pet = self._pets.get(pet_id)
+            if pet is None: return None
+            pet = dict(pet, status='found' if pet['status'] == 'not-found' else 'not-found')
+            self._append({"op": "put", "pet": pet})
+            return pet
+
+    def add_sighting(self, pet_id, sighting):
+        with self._locked(exclusive=True):
+            if pet_id not in self._pets: return None
+            sighting = dict(sighting, id=f"sighting_{self._rev + 1}")
+            self._append({"op": "sight", "id": pet_id, "sighting": sighting})
+            return sighting
+
+    def delete(self, pet_id):
+        with self._locked(exclusive=True):
+            pet = self._pets.get(pet_id)
+            if pet is None: return None
+            self._append({"op": "del", "id": pet_id})
+            return pet
+
+
+def area_filter(bbox, near):
+    # A predicate for pets inside bbox (south, west, north, east) or near
+    # (lat, lng, km), or None without an area.
+    if bbox:
+        south, west, north, east = bbox
+        return lambda pet: bool(pet.get("latlng")) and south <= pet["latlng"][0] <= north and west <= pet["latlng"][1] <= east
+    if near:
+        lat, lng, radius_km = near
+        return lambda pet: bool(pet.get("latlng")) and haversine_km(lat, lng, *pet["latlng"]) <= radius_km
+    return None
+
+
+def time_key(pet):
+    return (pet.get("submissionTime", 0), pet["id"])
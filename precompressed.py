@@ -0,0 +1,50 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+
+try:
+    import brotli
+except ImportError:  # optional: without it clients get gzip
+    brotli = None
+
+
+# --- Pre-compressed response bodies ---
+# A body is encoded once into every variant we can produce, each with its own
+# strong ETag, and a request just picks the best variant its Accept-Encoding
+# allows. Nothing is compressed on the request path.
+class CompressedBody:
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli: self.variants["br"] = brotli.compress(body, quality=11)
+
+    def choose(self, accept_encodings):
+        # Returns (encoding, bytes): the smallest variant the client accepts.
+        usable = [(len(data), encoding) for encoding, data in self.variants.items()
+                  if encoding == "identity" or accept_encodings[encoding] > 0]
+        _, encoding = min(usable)
+        return encoding, self.variants[encoding]
+
+    def etag(self, encoding):
+        return f"{self.digest[:32]}-{encoding}"
+
+
+# --- Fingerprinted static assets ---
+# css/style.css is published as css/style.<hash>.css, so a changed file gets a
+# new URL and every URL can be cached for good.
+def build_asset_manifest(static_folder, subfolders=('css', 'js')):
+    # Returns ({"css/style.css": "css/style.<hash>.css"}, {"css/style.<hash>.css": CompressedBody}).
+    urls, bodies = {}, {}
+    for subfolder in subfolders:
+        for root, _, files in os.walk(os.path.join(static_folder, subfolder)):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    body = CompressedBody(f.read(), mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+                stem, ext = os.path.splitext(name)
+                hashed = f"{stem}.{body.digest[:12]}{ext}"
+                urls[name], bodies[hashed] = hashed, body
+    return urls, bodies
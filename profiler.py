@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+
+# --- Per-request sampling profiler ---
+# A side thread samples the request thread's Python stack every `interval`
+# seconds via sys._current_frames() and counts each stack. stop() writes the
+# counts in collapsed-stack format ("outer;inner;leaf count" per line), which
+# flamegraph.pl, speedscope and inferno read directly.
+class SamplingProfiler:
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self._target = threading.get_ident()
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack: self._stacks[";".join(reversed(stack))] += 1
+
+    def stop(self, folder, label):
+        # Returns the path of the collapsed-stack file.
+        self._stop.set()
+        self._thread.join()
+        os.makedirs(folder, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_") or "root"
+        path = os.path.join(folder, f"{int(time.time() * 1000)}-{os.getpid()}-{safe_label}.folded")
+        with open(path, 'w') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -0,0 +1,151 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0
+
+
+# --- Grid bucket index ---
+# Points are bucketed into fixed lat/lng cells. A bbox query walks only the
+# cells it overlaps, takes fully covered cells wholesale and filters points
+# just in the cells on its edge, so the cost tracks the size of the answer
+# rather than the number of pets stored.
+class GridIndex:
+    def __init__(self, cell_size=0.005):
+        self.cell_size = cell_size
+        self._cells = {}    # (row, col) -> {id: (lat, lng)}
+        self._points = {}   # id -> (row, col)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+
+    def insert(self, item_id, lat, lng):
+        self.remove(item_id)
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, {})[item_id] = (lat, lng)
+        self._points[item_id] = cell
+
+    def remove(self, item_id):
+        cell = self._points.pop(item_id, None)
+        if cell is None: return
+        bucket = self._cells[cell]
+        del bucket[item_id]
+        if not bucket: del self._cells[cell]
+
+    def query_bbox(self, south, west, north, east):
+        if south > north or west > east: return []
+        row_lo, col_lo = self._cell(south, west)
+        row_hi, col_hi = self._cell(north, east)
+        found = []
+        for row, col in occupied_cells(self._cells, row_lo, col_lo, row_hi, col_hi):
+            bucket = self._cells[row, col]
+            if row_lo < row < row_hi and col_lo < col < col_hi:
+                found.extend(bucket)
+            else:
+                found.extend(i for i, (lat, lng) in bucket.items()
+                             if south <= lat <= north and west <= lng <= east)
+        return found
+
+    def query_radius(self, lat, lng, radius_km):
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        candidates = self.query_bbox(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+        return [i for i in candidates
+                if haversine_km(lat, lng, *self._cells[self._points[i]][i]) <= radius_km]
+
+
+# --- Multi-resolution cluster index ---
+# One aggregate grid per map zoom level, each cell half the size of the level
+# above so cells nest exactly. A cell keeps [count, lat sum, lng sum, newest
+# timestamp]; inserts touch one cell per level, and removals only rescan when
+# they take away a cell's newest point (the finest level rescans its members,
+# coarser levels their four child cells).
+class ClusterIndex:
+    def __init__(self, min_zoom=5, max_zoom=14, cell_px=64):
+        self.min_zoom, self.max_zoom = min_zoom, max_zoom
+        # 256px tiles: a cell_px cell at zoom z spans 360 / 2**z * cell_px / 256 degrees.
+        self._sizes = {z: 360 / 2 ** z * cell_px / 256 for z in range(min_zoom, max_zoom + 1)}
+        self._levels = {z: {} for z in self._sizes}   # zoom -> {(row, col): [count, sum_lat, sum_lng, newest]}
+        self._members = {}  # finest (row, col) -> {id: timestamp}
+        self._points = {}   # id -> (lat, lng, timestamp)
+
+    def _cell(self, zoom, lat, lng):
+        size = self._sizes[zoom]
+        return (math.floor(lat / size), math.floor(lng / size))
+
+    def clear(self):
+        for cells in self._levels.values(): cells.clear()
+        self._members.clear()
+        self._points.clear()
+
+    def insert(self, item_id, lat, lng, timestamp):
+        self.remove(item_id)
+        self._points[item_id] = (lat, lng, timestamp)
+        for zoom, cells in self._levels.items():
+            agg = cells.setdefault(self._cell(zoom, lat, lng), [0, 0.0, 0.0, timestamp])
+            agg[0] += 1
+            agg[1] += lat
+            agg[2] += lng
+            agg[3] = max(agg[3], timestamp)
+        self._members.setdefault(self._cell(self.max_zoom, lat, lng), {})[item_id] = timestamp
+
+    def remove(self, item_id):
+        point = self._points.pop(item_id, None)
+        if point is None: return
+        lat, lng, timestamp = point
+        finest = self._cell(self.max_zoom, lat, lng)
+        members = self._members[finest]
+        del members[item_id]
+        if not members: del self._members[finest]
+
+        for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+            cells = self._levels[zoom]
+            cell = self._cell(zoom, lat, lng)
+            agg = cells[cell]
+            agg[0] -= 1
+            if agg[0] == 0:
+                del cells[cell]
+                continue
+            agg[1] -= lat
+            agg[2] -= lng
+            if timestamp < agg[3]: continue
+            if zoom == self.max_zoom:
+                agg[3] = max(members.values())
+            else:
+                row, col = cell
+                children = self._levels[zoom + 1]
+                agg[3] = max(children[r, c][3] for r in (2 * row, 2 * row + 1) for c in (2 * col, 2 * col + 1)
+                             if (r, c) in children)
+
+    def query(self, south, west, north, east, zoom):
+        zoom = min(max(int(zoom), self.min_zoom), self.max_zoom)
+        cells = self._levels[zoom]
+        row_lo, col_lo = self._cell(zoom, south, west)
+        row_hi, col_hi = self._cell(zoom, north, east)
+        return [{"count": agg[0], "latlng": [agg[1] / agg[0], agg[2] / agg[0]], "newest": agg[3]}
+                for agg in (cells[c] for c in occupied_cells(cells, row_lo, col_lo, row_hi, col_hi))]
+
+
+def occupied_cells(cells, row_lo, col_lo, row_hi, col_hi):
+    # A huge box over a sparse grid is cheaper to answer by scanning the
+    # occupied cells than by walking every empty cell it covers.
+    if row_lo > row_hi or col_lo > col_hi: return []
+    if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(cells):
+        return [c for c in cells if row_lo <= c[0] <= row_hi and col_lo <= c[1] <= col_hi]
+    return [(r, c) for r in range(row_lo, row_hi + 1) for c in range(col_lo, col_hi + 1) if (r, c) in cells]
+
+
+def valid_latlng(lat, lng):
+    return math.isfinite(lat) and math.isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
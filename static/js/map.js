@@ -82,24 +82,158 @@ document.addEventListener('DOMContentLoaded', function () {
         const bounds = [[petData.latlng[0] - radius, petData.latlng[1] - radius], [petData.latlng[0] + radius, petData.latlng[1] + radius]];
         const grid = L.rectangle(bounds, { color: "#e74c3c", weight: 1, fillOpacity: 0.1 }).addTo(window.map);
 
-        window.mapLayers[petData.id] = { marker: redMarker, grid: grid, sightings: [] };
+        window.mapLayers[petData.id] = { marker: redMarker, grid: grid, sightings: {} };
+        (petData.sightings || []).forEach(sighting => addSightingToMap(petData.id, sighting));
+    }
+
+    function addSightingToMap(petId, sighting) {
+        const layers = window.mapLayers[petId];
+        if (!layers || layers.sightings[sighting.id]) return;
+        const icon = sighting.kind === 'sighted' ? window.greenIcon : window.yellowIcon;
+        layers.sightings[sighting.id] = L.marker(sighting.latlng, { icon: icon }).addTo(window.map);
     }
     
     function removePetFromMap(petId) {
         if (window.mapLayers[petId]) {
             window.map.removeLayer(window.mapLayers[petId].marker);
             window.map.removeLayer(window.mapLayers[petId].grid);
-            window.mapLayers[petId].sightings.forEach(s => window.map.removeLayer(s));
+            Object.values(window.mapLayers[petId].sightings).forEach(s => window.map.removeLayer(s));
             delete window.mapLayers[petId];
         }
     }
 
-    // 5. API INTERACTIONS (Unchanged)
-    async function loadInitialData() {
-        const response = await fetch('/api/pets');
-        lostPetsData = await response.json();
+    // Below CLUSTER_BELOW_ZOOM the server sends pre-aggregated clusters instead
+    // of one pin and search grid per report.
+    const CLUSTER_BELOW_ZOOM = 15;
+    const CLUSTERED_LIST_LIMIT = 100;
+    const clusterLayer = L.layerGroup().addTo(window.map);
+    const isClustered = () => window.map.getZoom() < CLUSTER_BELOW_ZOOM;
+
+    function drawClusters(clusters) {
+        clusterLayer.clearLayers();
+        clusters.forEach(cluster => {
+            const size = 28 + Math.min(24, Math.round(Math.log2(cluster.count) * 4));
+            const icon = L.divIcon({ className: 'pet-cluster', html: `<span>${cluster.count}</span>`, iconSize: [size, size] });
+            L.marker(cluster.latlng, { icon: icon })
+                .on('click', () => window.map.setView(cluster.latlng, Math.min(window.map.getZoom() + 2, CLUSTER_BELOW_ZOOM)))
+                .addTo(clusterLayer);
+        });
+    }
+
+    function showPet(pet) {
+        if (isClustered()) scheduleViewportRefresh();
+        else addLostPetToMap(pet);
+    }
+
+    let refreshTimer = null;
+    function scheduleViewportRefresh() {
+        clearTimeout(refreshTimer);
+        refreshTimer = setTimeout(loadViewportPets, 2000);
+    }
+
+    // 5. API INTERACTIONS
+    // Only reports inside the (slightly padded) viewport are fetched and drawn;
+    // pets that scroll out of view are dropped from the map and the list.
+    let viewportRequest = 0;
+    async function loadViewportPets() {
+        const requestId = ++viewportRequest;
+        const clustered = isClustered();
+        const bbox = window.map.getBounds().pad(0.25).toBBoxString();
+        const [response, clusterResponse] = await Promise.all([
+            fetch(clustered ? `/api/pets?bbox=${bbox}&status=not-found&order=desc&limit=${CLUSTERED_LIST_LIMIT}` : `/api/pets?bbox=${bbox}`),
+            clustered ? fetch(`/api/pets/clusters?bbox=${bbox}&zoom=${window.map.getZoom()}`) : null,
+        ]);
+        if (!response.ok || requestId !== viewportRequest) return; // a newer pan/zoom won
+        if (clustered) {
+            // The list shows the newest lost pets in view; the map shows clusters only.
+            lostPetsData = Object.fromEntries((await response.json()).pets.map(pet => [pet.id, pet]));
+            Object.keys(window.mapLayers).forEach(removePetFromMap);
+            if (clusterResponse.ok) drawClusters(await clusterResponse.json());
+        } else {
+            lostPetsData = await response.json();
+            clusterLayer.clearLayers();
+            Object.keys(window.mapLayers).forEach(petId => {
+                if (!lostPetsData[petId]) removePetFromMap(petId);
+            });
+            Object.values(lostPetsData).forEach(pet => addLostPetToMap(pet));
+        }
         renderPetList();
-        Object.values(lostPetsData).forEach(pet => addLostPetToMap(pet));
+        if (changeRevision === null) {
+            changeRevision = response.headers.get('X-Pets-Revision');
+            if (window.EventSource) openChangeStream();
+            else setTimeout(pollChanges, CHANGE_POLL_MS);
+        }
+    }
+
+    // Other users' reports arrive as Server-Sent Events and are applied in place.
+    // When the server refuses a stream (it caps them per worker) or the browser
+    // has no EventSource, the change feed is polled instead, and the stream is
+    // tried again now and then.
+    const CHANGE_POLL_MS = 5000;
+    const CHANGE_STREAM_RETRY_MS = 60000;
+    let changeRevision = null;
+    let streamRetryAt = 0;
+    function applyChange(change) {
+        if (change.op === 'sighting') {
+            const pet = lostPetsData[change.id];
+            if (pet) pet.sightings = (pet.sightings || []).concat([change.sighting]);
+            addSightingToMap(change.id, change.sighting);
+            return;
+        }
+        if (isClustered()) scheduleViewportRefresh(); // counts changed (found pets drop out)
+        const inView = change.pet && window.map.getBounds().pad(0.25).contains(change.pet.latlng);
+        if (change.op === 'delete' || !inView) {
+            removePetFromMap(change.id);
+            delete lostPetsData[change.id];
+        } else {
+            lostPetsData[change.id] = change.pet;
+            if (!isClustered()) addLostPetToMap(change.pet);
+        }
+    }
+
+    function openChangeStream() {
+        const stream = new EventSource(`/api/pets/stream?since=${changeRevision}`);
+        stream.addEventListener('change', e => {
+            const change = JSON.parse(e.data);
+            applyChange(change);
+            changeRevision = change.rev;
+            renderPetList();
+        });
+        stream.addEventListener('resync', () => {
+            // We fell behind the server's change buffer: start over from a fresh snapshot.
+            stream.close();
+            changeRevision = null;
+            loadViewportPets();
+        });
+        stream.addEventListener('error', () => {
+            // A dropped connection is retried by the browser itself; a refused
+            // one (e.g. 503) closes the stream for good, so switch to polling.
+            if (stream.readyState !== EventSource.CLOSED) return;
+            streamRetryAt = Date.now() + CHANGE_STREAM_RETRY_MS;
+            setTimeout(pollChanges, CHANGE_POLL_MS);
+        });
+    }
+
+    async function pollChanges() {
+        try {
+            const response = await fetch(`/api/pets/changes?since=${changeRevision}`);
+            if (response.ok) {
+                const feed = await response.json();
+                if (feed.resync) {
+                    // We fell behind the server's change buffer: start over from a fresh snapshot.
+                    changeRevision = null;
+                    loadViewportPets();
+                    return;
+                }
+                feed.changes.forEach(applyChange);
+                if (feed.changes.length) renderPetList();
+                changeRevision = feed.rev;
+            }
+        } catch (err) {
+            // Offline for a moment; the next poll catches up from the same revision.
+        }
+        if (window.EventSource && Date.now() >= streamRetryAt) openChangeStream();
+        else setTimeout(pollChanges, CHANGE_POLL_MS);
     }
 
     // 6. EVENT LISTENERS
@@ -108,9 +242,15 @@ document.addEventListener('DOMContentLoaded', function () {
         // If we are in the special "placing a pin" mode
         if (window.placingSighting.active) {
             const { color, petId } = window.placingSighting;
-            const icon = color === 'green' ? window.greenIcon : window.yellowIcon;
-            const newSightingMarker = L.marker(e.latlng, { icon: icon }).addTo(window.map);
-            window.mapLayers[petId].sightings.push(newSightingMarker);
+            const kind = color === 'green' ? 'sighted' : 'searched';
+            fetch(`/api/pets/${petId}/sightings`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ latitude: e.latlng.lat, longitude: e.latlng.lng, kind: kind }),
+            }).then(async response => {
+                if (response.ok) addSightingToMap(petId, await response.json());
+                else alert('Error saving sighting.');
+            });
 
             // Exit placing mode
             window.placingSighting = { active: false, color: null, petId: null };
@@ -134,7 +274,7 @@ document.addEventListener('DOMContentLoaded', function () {
         if (response.ok) {
             const newPet = await response.json();
             lostPetsData[newPet.id] = newPet;
-            addLostPetToMap(newPet);
+            showPet(newPet);
             renderPetList();
             petForm.reset();
             document.getElementById('lost-pet-form-container').style.display = 'none';
@@ -174,5 +314,6 @@ document.addEventListener('DOMContentLoaded', function () {
         L.marker(loc.coords, { icon: window.blueIcon }).addTo(window.map).bindTooltip(loc.name, { permanent: true, direction: 'top', offset: [0, -20] }).openTooltip();
     });
     
-    loadInitialData();
+    window.map.on('moveend', loadViewportPets);
+    loadViewportPets();
 });
\ No newline at end of file
@@ -0,0 +1,63 @@
+from functools import lru_cache
+
+SEVERITY_RANKS = {"Mild": 1, "Moderate": 2, "Severe": 3, "Potentially Severe": 3, "Significant": 3}
+COMBINATION_ADVICE = " Given the combination of symptoms, a veterinary consultation is strongly recommended to get an accurate diagnosis."
+
+
+def rank_severity(severity):
+    # Whole labels ("Potentially Severe") win over their first word ("Moderate to Severe" -> "Moderate").
+    if severity in SEVERITY_RANKS: return severity, SEVERITY_RANKS[severity]
+    label = severity.split(' ')[0]
+    return label, SEVERITY_RANKS.get(label, 1)
+
+
+# --- Compiled symptom table ---
+# Built once per *_SYMPTOM_DATA dict: every symptom gets a bit, its severity is
+# ranked up front and its diagnoses become bits over the table's deduplicated
+# diagnosis list. A request reduces to OR-ing masks, and results always list
+# diagnoses and actions in table order, so equal symptom sets give equal,
+# cacheable responses.
+class SymptomRules:
+    def __init__(self, table, cache_size=1024):
+        self._symptom_bits = {}
+        self._severities = []     # per symptom bit: (label, rank)
+        self._actions = []        # per symptom bit
+        self._diagnosis_masks = []
+        self._diagnoses = []      # deduplicated, in first-seen order
+        diagnosis_ids = {}
+
+        for bit, (symptom, info) in enumerate(table.items()):
+            self._symptom_bits[symptom] = bit
+            self._severities.append(rank_severity(info.get("severity", "Mild")))
+            self._actions.append(info["course_of_action"])
+            mask = 0
+            for diagnosis in info["probable_diagnoses"]:
+                if diagnosis not in diagnosis_ids:
+                    diagnosis_ids[diagnosis] = len(self._diagnoses)
+                    self._diagnoses.append(diagnosis)
+                mask |= 1 << diagnosis_ids[diagnosis]
+            self._diagnosis_masks.append(mask)
+
+        self._evaluate_mask = lru_cache(maxsize=cache_size)(self._evaluate_mask)
+
+    def evaluate(self, symptoms):
+        # Unknown symptoms are ignored, but still count towards "a combination" as before.
+        mask = 0
+        for symptom in symptoms:
+            bit = self._symptom_bits.get(symptom)
+            if bit is not None: mask |= 1 << bit
+        severity, diagnoses, actions = self._evaluate_mask(mask, len(symptoms) > 1)
+        return {"severity": severity, "probable_diagnoses": list(diagnoses), "course_of_action": actions}
+
+    def _evaluate_mask(self, mask, combined):
+        severity, severity_rank, diagnosis_mask, actions = "Mild", 1, 0, []
+        for bit in range(len(self._actions)):
+            if not mask >> bit & 1: continue
+            label, rank = self._severities[bit]
+            if rank > severity_rank: severity, severity_rank = label, rank
+            diagnosis_mask |= self._diagnosis_masks[bit]
+            actions.append(self._actions[bit])
+
+        diagnoses = tuple(d for i, d in enumerate(self._diagnoses) if diagnosis_mask >> i & 1)
+        combined_actions = " ".join(actions) + (COMBINATION_ADVICE if combined else "")
+        return severity, diagnoses, combined_actions
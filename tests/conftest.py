@@ -0,0 +1,32 @@
+import os
+import pytest
+from pet_store import PetStore
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    # app.py opens pets.log, data.json and the uploads folder relative to the
+    # working directory when it is imported, so import it from a scratch one.
+    workdir = tmp_path_factory.mktemp("app")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import app
+        app.registry.shared_dir = str(workdir / "metrics.d")
+        yield app
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app_module, tmp_path, monkeypatch):
+    # Every test gets an empty pet store of its own.
+    monkeypatch.setattr(app_module, "pet_store", PetStore(str(tmp_path / "pets.log")))
+    return app_module.app.test_client()
+
+
+def make_pet(i, **fields):
+    pet = {"id": f"pet_{i}", "name": f"Pet {i}", "contact": "0300", "description": "",
+           "imageUrl": f"/uploads/{i}.jpg", "latlng": [31.5, 74.3], "submissionTime": i, "status": "not-found"}
+    pet.update(fields)
+    return pet
@@ -0,0 +1,111 @@
+import io
+from conftest import make_pet
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 32
+
+
+def report_form(**fields):
+    form = {"pet_image": (io.BytesIO(PNG), "pet.png"), "pet_name": "Moti", "contact": "0300",
+            "description": "Brown tabby", "latitude": "31.5", "longitude": "74.3", "submissionTime": "1700000000000"}
+    form.update(fields)
+    return form
+
+
+# --- Area queries and coordinate validation ---
+def test_bbox_and_near_return_only_pets_in_the_area(client, app_module):
+    app_module.pet_store.put(make_pet(1, latlng=[31.50, 74.30]))
+    app_module.pet_store.put(make_pet(2, latlng=[31.60, 74.40]))
+    app_module.pet_store.put(make_pet(3, latlng=None))
+    assert set(client.get('/api/pets?bbox=74.25,31.45,74.35,31.55').get_json()) == {"pet_1"}
+    assert set(client.get('/api/pets?near=31.6,74.4&radius_km=1').get_json()) == {"pet_2"}
+    assert set(client.get('/api/pets').get_json()) == {"pet_1", "pet_2", "pet_3"}
+
+
+def test_non_finite_area_parameters_are_rejected(client):
+    for query in ['bbox=nan,31,75,32', 'bbox=-inf,0,inf,1', 'bbox=1,2,3', 'near=nan,74',
+                  'near=31.5,74.3&radius_km=inf', 'near=31.5,74.3&radius_km=0', 'near=91,74']:
+        response = client.get(f'/api/pets?{query}')
+        assert response.status_code == 400, query
+        assert response.get_json() == {"error": "Invalid bbox or near/radius_km parameters"}
+
+
+def test_huge_finite_bbox_is_clamped_to_the_globe(client, app_module):
+    app_module.pet_store.put(make_pet(1))
+    response = client.get('/api/pets?bbox=-1e308,-1e308,1e308,1e308')
+    assert response.status_code == 200
+    assert set(response.get_json()) == {"pet_1"}
+
+
+def test_report_with_bad_coordinates_is_rejected_and_not_stored(client, app_module):
+    for lat in ['nan', 'inf', '1e308', '-91']:
+        response = client.post('/api/pets', data=report_form(latitude=lat))
+        assert response.status_code == 400, lat
+    assert client.get('/api/pets').get_json() == {}
+
+    response = client.post('/api/pets', data=report_form())
+    assert response.status_code == 201
+    assert response.get_json()["latlng"] == [31.5, 74.3]
+
+
+# --- Paging, filters and conditional requests ---
+def collect_pages(client, query):
+    ids, cursor = [], None
+    while True:
+        page = client.get(f'/api/pets?{query}' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        ids += [pet["id"] for pet in page["pets"]]
+        cursor = page["next_cursor"]
+        if not cursor: return ids
+
+
+def test_cursor_pages_cover_every_pet_once_in_both_orders(client, app_module):
+    # Several pets share a submissionTime, so ids break the ties.
+    for i in range(23):
+        app_module.pet_store.put(make_pet(i, submissionTime=i // 3, status="found" if i % 4 == 0 else "not-found",
+                                          latlng=[31.5 + (i % 2) * 0.1, 74.3]))
+    for query in ['limit=5', 'limit=4&status=found', 'limit=3&bbox=74.2,31.45,74.4,31.55',
+                  'limit=2&near=31.5,74.3&radius_km=1&submitted_before=5']:
+        ascending = collect_pages(client, query)
+        assert ascending == collect_pages(client, query + '&order=desc')[::-1]
+        assert len(ascending) == len(set(ascending))
+
+    everything = collect_pages(client, 'limit=5')
+    assert len(everything) == 23
+    assert everything == sorted(everything, key=lambda pet_id: (int(pet_id[4:]) // 3, pet_id))
+
+
+def test_submitted_after_is_exclusive(client, app_module):
+    for i in range(4):
+        app_module.pet_store.put(make_pet(i, submissionTime=[5, 5, 6, 7][i]))
+    assert sorted(client.get('/api/pets?submitted_after=5').get_json()) == ["pet_2", "pet_3"]
+    assert [p["id"] for p in client.get('/api/pets?submitted_after=5&limit=10').get_json()["pets"]] == ["pet_2", "pet_3"]
+    assert sorted(client.get('/api/pets?submitted_after=4&submitted_before=6').get_json()) == ["pet_0", "pet_1", "pet_2"]
+
+
+def test_bad_paging_parameters_are_rejected(client):
+    for query in ['limit=abc', 'limit=0', 'cursor=not-a-cursor', 'cursor=WzFlNDAwLCAieCJd', 'order=sideways',
+                  'status=lost', 'submitted_after=yesterday']:
+        assert client.get(f'/api/pets?{query}').status_code == 400, query
+
+
+def test_etag_returns_304_until_the_store_changes(client, app_module):
+    app_module.pet_store.put(make_pet(1))
+    response = client.get('/api/pets?limit=10')
+    etag = response.headers['ETag']
+    assert response.headers['X-Pets-Revision'] == '1'
+
+    assert client.get('/api/pets?limit=10', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/pets?limit=11', headers={'If-None-Match': etag}).status_code == 200  # other query
+    assert client.get('/api/pets?limit=10&format=ndjson', headers={'If-None-Match': etag}).status_code == 200
+
+    app_module.pet_store.toggle_status("pet_1")
+    response = client.get('/api/pets?limit=10', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()["pets"][0]["status"] == "found"
+
+
+def test_ndjson_streams_one_pet_per_line(client, app_module):
+    for i in range(3):
+        app_module.pet_store.put(make_pet(i))
+    response = client.get('/api/pets?format=ndjson&limit=2')
+    assert response.mimetype == 'application/x-ndjson'
+    assert [line.count('"id"') for line in response.get_data(as_text=True).splitlines()] == [1, 1]
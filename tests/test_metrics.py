@@ -0,0 +1,94 @@
+import os
+import json
+import subprocess
+import sys
+from metrics import EXITED_FILE, Registry, format_labels
+
+
+def make_registry(shared_dir=None):
+    registry = Registry(shared_dir=shared_dir)
+    registry.counter("requests_total", "Requests.")
+    registry.gauge("in_flight", "Requests in flight.")
+    registry.histogram("duration_seconds", "Durations.", buckets=(0.1, 1.0))
+    return registry
+
+
+def test_render_uses_prometheus_text_format():
+    registry = make_registry()
+    registry.inc("requests_total", route="/api/pets", status="200")
+    registry.inc("requests_total", 2, route="/api/pets", status="200")
+    registry.inc("in_flight", route="/")
+    for value in (0.05, 0.5, 0.7, 3.0):
+        registry.observe("duration_seconds", value, route="/")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/api/pets",status="200"} 3' in lines
+    assert 'in_flight{route="/"} 1' in lines
+    # Buckets are cumulative and +Inf equals the count.
+    assert 'duration_seconds_bucket{route="/",le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{route="/",le="1.0"} 3' in lines
+    assert 'duration_seconds_bucket{route="/",le="+Inf"} 4' in lines
+    assert 'duration_seconds_count{route="/"} 4' in lines
+    assert 'duration_seconds_sum{route="/"} 4.25' in lines
+
+
+def test_label_values_are_escaped():
+    assert format_labels([["path", 'a"b\\c\nd']]) == '{path="a\\"b\\\\c\\nd"}'
+    assert format_labels([]) == ""
+
+
+CHILD = """
+import sys
+sys.path.insert(0, {root!r})
+from metrics import Registry
+registry = Registry(shared_dir={shared_dir!r})
+registry.counter("requests_total", "Requests.")
+registry.gauge("in_flight", "Requests in flight.")
+registry.histogram("duration_seconds", "Durations.", buckets=(0.1, 1.0))
+registry.inc("requests_total", 5)
+registry.inc("in_flight", 3)
+registry.observe("duration_seconds", 0.5)
+registry.flush()
+"""
+
+
+def test_exited_workers_are_folded_into_the_totals(tmp_path):
+    shared_dir = str(tmp_path / "metrics.d")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", CHILD.format(root=root, shared_dir=shared_dir)], check=True)
+
+    registry = make_registry(shared_dir)
+    registry.inc("requests_total", 1)
+    merged = registry.collect()
+    assert merged["requests_total"]["samples"] == [[[], 11]]
+    assert merged["in_flight"]["samples"] == []          # gauges of exited workers are dropped
+    assert merged["duration_seconds"]["samples"][0][1][-1] == 2
+    assert sorted(os.listdir(shared_dir)) == [".lock", f"{os.getpid()}.json", EXITED_FILE]
+
+    # Scraping again must not count the exited workers twice.
+    assert registry.collect()["requests_total"]["samples"] == [[[], 11]]
+
+
+def test_a_recycled_pid_does_not_overwrite_an_exited_workers_snapshot(tmp_path):
+    shared_dir = tmp_path / "metrics.d"
+    shared_dir.mkdir()
+    stale = {"requests_total": {"kind": "counter", "help": "Requests.", "buckets": None, "samples": [[[], 7]]}}
+    (shared_dir / f"{os.getpid()}.json").write_text(json.dumps(stale))
+
+    registry = make_registry(str(shared_dir))
+    registry.inc("requests_total", 1)
+    assert registry.collect()["requests_total"]["samples"] == [[[], 8]]
+
+
+def test_profile_header_with_non_ascii_value_does_not_fail(client, app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_SECRET', 's3cret')
+    assert client.get('/api/pets', headers={'X-Profile': 'sécret'}).status_code == 200
+    assert 'X-Profile-File' not in client.get('/api/pets', headers={'X-Profile': 'wrong'}).headers
+
+
+def test_metrics_endpoint_serves_request_counts(client):
+    client.get('/api/pets')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'pethelp_http_requests_total{method="GET",route="/api/pets",status="200"}' in body
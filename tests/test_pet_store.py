@@ -0,0 +1,117 @@
+import os
+import json
+import math
+import time
+import multiprocessing
+import pytest
+from pet_store import PetStore
+
+WORKERS = 4
+WRITES_PER_WORKER = 300
+
+
+def _write_pets(log_path, worker):
+    # Small compaction thresholds so every worker keeps trying to compact while
+    # the others append.
+    store = PetStore(log_path, compact_min_records=20, compact_ratio=1.5)
+    for i in range(WRITES_PER_WORKER):
+        pet_id = f"pet_{worker}_{i % 10}"
+        store.put({"id": pet_id, "name": f"{worker}-{i}", "status": "not-found",
+                   "submissionTime": i, "latlng": [31.5, 74.3]})
+        if i % 3 == 0: store.toggle_status(pet_id)
+    # Let a compaction started by the last write finish before the process exits.
+    for _ in range(100):
+        if not store._compacting: break
+        time.sleep(0.01)
+
+
+def test_concurrent_writers_compact_without_corrupting_the_log(tmp_path):
+    log_path = str(tmp_path / "pets.log")
+    PetStore(log_path)
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_write_pets, args=(log_path, w)) for w in range(WORKERS)]
+    for worker in workers: worker.start()
+    for worker in workers: worker.join(60)
+    assert [worker.exitcode for worker in workers] == [0] * WORKERS
+
+    with open(log_path, 'rb') as f:
+        records = [json.loads(line) for line in f]
+    assert records[0]["op"] == "rev"
+
+    store = PetStore(log_path)
+    pets = store.all()
+    assert len(pets) == WORKERS * 10
+    for w in range(WORKERS):
+        assert pets[f"pet_{w}_9"]["name"] == f"{w}-{WRITES_PER_WORKER - 1}"
+    assert store.revision() == WORKERS * (WRITES_PER_WORKER + WRITES_PER_WORKER // 3)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_rewritten_log_on_same_inode_is_reloaded(tmp_path):
+    log_path = str(tmp_path / "pets.log")
+    reader = PetStore(log_path)
+    writer = PetStore(log_path)
+    writer.put({"id": "pet_1", "name": "Moti", "status": "not-found", "submissionTime": 1})
+    assert reader.get("pet_1")["name"] == "Moti"
+
+    # Rewrite the file in place with a new generation and the same size, as if
+    # another worker compacted into a recycled inode.
+    with open(log_path, 'rb') as f:
+        original = f.read()
+    rewritten = original.replace(b'Moti', b'Rani')
+    rewritten = rewritten.replace(json.loads(original.splitlines()[0])["gen"].encode(), b'f' * 16)
+    with open(log_path, 'r+b') as f:
+        f.write(rewritten)
+    os.utime(log_path, ns=(0, 0))
+
+    assert reader.get("pet_1")["name"] == "Rani"
+
+
+class CountingDict(dict):
+    lookups = 0
+
+    def __getitem__(self, key):
+        self.lookups += 1
+        return super().__getitem__(key)
+
+
+def test_area_pages_cost_stays_bounded(tmp_path):
+    # 40k pets on a 200x200 grid over roughly 0.2 degrees, submission time
+    # unrelated to position.
+    log_path = str(tmp_path / "pets.log")
+    with open(log_path, 'w') as f:
+        f.write(json.dumps({"op": "rev", "rev": 0}) + "\n")
+        for i in range(40000):
+            pet = {"id": f"pet_{i}", "status": "not-found", "submissionTime": (i * 7919) % 40000,
+                   "latlng": [31.4 + (i // 200) * 0.001, 74.2 + (i % 200) * 0.001]}
+            f.write(json.dumps({"op": "put", "rev": i + 1, "pet": pet}) + "\n")
+    store = PetStore(log_path)
+    bound = 3 * math.isqrt(len(store._pets) * 20)
+
+    for bbox in [(31.4, 74.2, 31.6, 74.4),          # everything
+                 (31.45, 74.25, 31.5, 74.3),        # a dense corner
+                 (31.4505, 74.2505, 31.4525, 74.2525),  # a handful of pets
+                 (10.0, 10.0, 11.0, 11.0)]:         # nothing at all
+        for descending in (False, True):
+            store._pets = CountingDict(store._pets)
+            page = store.by_time(limit=20, descending=descending, bbox=bbox)
+            assert store._pets.lookups <= bound
+
+            south, west, north, east = bbox
+            expected = sorted((p for p in store._pets.values()
+                               if south <= p["latlng"][0] <= north and west <= p["latlng"][1] <= east),
+                              key=lambda p: (p["submissionTime"], p["id"]), reverse=descending)[:20]
+            assert page == expected
+
+
+def test_invalid_coordinates_are_never_written_to_the_log(tmp_path):
+    log_path = str(tmp_path / "pets.log")
+    store = PetStore(log_path)
+    store.put({"id": "pet_1", "status": "not-found", "submissionTime": 1, "latlng": [31.5, 74.3]})
+    size = os.path.getsize(log_path)
+    for latlng in ([float('nan'), 74.3], [31.5, float('inf')], [1e308, 74.3], [31.5]):
+        with pytest.raises(ValueError):
+            store.put({"id": "pet_2", "status": "not-found", "submissionTime": 2, "latlng": latlng})
+    assert os.path.getsize(log_path) == size
+    assert list(PetStore(log_path).all()) == ["pet_1"]
@@ -0,0 +1,69 @@
+import gzip
+import re
+from werkzeug.datastructures import Accept
+from precompressed import CompressedBody, brotli, build_asset_manifest
+
+BODY = b"<html>" + b"lost pets " * 500 + b"</html>"
+
+
+def test_choose_picks_the_smallest_variant_the_client_accepts():
+    body = CompressedBody(BODY, "text/html")
+    assert body.choose(Accept()) == ("identity", BODY)
+    encoding, data = body.choose(Accept([("gzip", 1)]))
+    assert encoding == "gzip" and gzip.decompress(data) == BODY
+    assert body.choose(Accept([("gzip", 0)]))[0] == "identity"  # q=0 means "not acceptable"
+    expected = "br" if brotli else "gzip"
+    assert body.choose(Accept([("gzip", 1), ("br", 1)]))[0] == expected
+
+
+def test_every_variant_has_its_own_strong_etag():
+    body = CompressedBody(BODY, "text/html")
+    etags = {body.etag(encoding) for encoding in body.variants}
+    assert len(etags) == len(body.variants)
+    assert CompressedBody(BODY, "text/html").etag("gzip") == body.etag("gzip")  # stable across workers
+    assert CompressedBody(BODY + b"!", "text/html").etag("gzip") != body.etag("gzip")
+
+
+def test_asset_manifest_fingerprints_file_names(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "style.css").write_text("body { color: red; }")
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "map.js").write_text("console.log(1);")
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "photo.jpg").write_bytes(b"\xff\xd8\xff")
+
+    urls, bodies = build_asset_manifest(str(tmp_path))
+    assert set(urls) == {"css/style.css", "js/map.js"}
+    assert re.fullmatch(r"css/style\.[0-9a-f]{12}\.css", urls["css/style.css"])
+    assert bodies[urls["css/style.css"]].mimetype == "text/css"
+
+    (tmp_path / "css" / "style.css").write_text("body { color: blue; }")
+    assert build_asset_manifest(str(tmp_path))[0]["css/style.css"] != urls["css/style.css"]
+
+
+def test_pages_are_served_precompressed_with_per_variant_etags(client):
+    plain = client.get('/')
+    assert plain.status_code == 200 and 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    zipped = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+
+    again = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']})
+    assert again.status_code == 304
+    # The gzip ETag does not validate the identity variant.
+    assert client.get('/', headers={'If-None-Match': zipped.headers['ETag']}).status_code == 200
+
+
+def test_pages_link_hashed_assets_served_as_immutable(client):
+    page = client.get('/lost-pet-map').get_data(as_text=True)
+    asset_urls = re.findall(r'/assets/[\w/.-]+', page)
+    assert any(re.fullmatch(r'/assets/js/map\.[0-9a-f]{12}\.js', url) for url in asset_urls)
+
+    for url in asset_urls:
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200, url
+        assert 'immutable' in response.headers['Cache-Control']
+    assert client.get('/assets/js/map.000000000000.js').status_code == 404
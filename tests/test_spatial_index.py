@@ -0,0 +1,103 @@
+import math
+import random
+from spatial_index import ClusterIndex, GridIndex, haversine_km
+
+
+def brute_force_clusters(index, points):
+    # {zoom: {cell: [count, sum_lat, sum_lng, newest]}} recomputed from scratch.
+    levels = {}
+    for zoom in index._levels:
+        cells = levels.setdefault(zoom, {})
+        for lat, lng, ts in points.values():
+            agg = cells.setdefault(index._cell(zoom, lat, lng), [0, 0.0, 0.0, ts])
+            agg[0] += 1
+            agg[1] += lat
+            agg[2] += lng
+            agg[3] = max(agg[3], ts)
+    return levels
+
+
+def test_cluster_index_matches_brute_force_after_inserts_and_removes():
+    rng = random.Random(7)
+    index, points = ClusterIndex(), {}
+    for step in range(3000):
+        item_id = f"pet_{rng.randrange(400)}"
+        if item_id in points and rng.random() < 0.5:
+            index.remove(item_id)
+            del points[item_id]
+        else:
+            # A small area so cells at every zoom hold several points, with
+            # repeated timestamps to exercise ties for "newest".
+            point = (31.4 + rng.random() * 0.2, 74.2 + rng.random() * 0.2, rng.randrange(50))
+            index.insert(item_id, *point)
+            points[item_id] = point
+
+        if step % 100 == 0 or step == 2999:
+            expected = brute_force_clusters(index, points)
+            for zoom, cells in index._levels.items():
+                assert set(cells) == set(expected[zoom])
+                for cell, (count, sum_lat, sum_lng, newest) in cells.items():
+                    want = expected[zoom][cell]
+                    assert (count, newest) == (want[0], want[3])
+                    assert math.isclose(sum_lat, want[1]) and math.isclose(sum_lng, want[2])
+
+
+def test_cluster_query_clamps_zoom_and_averages_positions():
+    index = ClusterIndex(min_zoom=5, max_zoom=14)
+    index.insert("a", 31.50, 74.30, 10)
+    index.insert("b", 31.52, 74.32, 20)
+    clusters = index.query(31.0, 74.0, 32.0, 75.0, zoom=2)  # below min_zoom
+    assert len(clusters) == 1
+    assert clusters[0]["count"] == 2 and clusters[0]["newest"] == 20
+    assert all(map(math.isclose, clusters[0]["latlng"], [31.51, 74.31]))
+    assert len(index.query(31.0, 74.0, 32.0, 75.0, zoom=30)) == 2  # above max_zoom: finest level
+
+
+def test_grid_bbox_includes_points_on_every_edge():
+    grid = GridIndex(cell_size=0.01)
+    grid.insert("sw", 31.40, 74.20)
+    grid.insert("ne", 31.50, 74.30)
+    grid.insert("inside", 31.45, 74.25)
+    grid.insert("outside", 31.5001, 74.25)
+    assert sorted(grid.query_bbox(31.40, 74.20, 31.50, 74.30)) == ["inside", "ne", "sw"]
+    assert grid.query_bbox(31.50, 74.30, 31.40, 74.20) == []  # inverted box
+
+
+def test_grid_bbox_matches_brute_force_including_negative_and_sparse_boxes():
+    rng = random.Random(3)
+    grid, points = GridIndex(cell_size=0.005), {}
+    for i in range(2000):
+        points[i] = (rng.uniform(-1, 1), rng.uniform(-1, 1))
+        grid.insert(i, *points[i])
+    for _ in range(200):
+        south, north = sorted(rng.uniform(-1.2, 1.2) for _ in range(2))
+        west, east = sorted(rng.uniform(-1.2, 1.2) for _ in range(2))
+        expected = {i for i, (lat, lng) in points.items() if south <= lat <= north and west <= lng <= east}
+        assert set(grid.query_bbox(south, west, north, east)) == expected
+    # A box far larger than the occupied area takes the scan-occupied-cells path.
+    assert len(grid.query_bbox(-90, -180, 90, 180)) == len(points)
+
+
+def test_grid_radius_is_inclusive_and_uses_great_circle_distance():
+    grid = GridIndex()
+    center = (31.5, 74.3)
+    for i, km in enumerate([0.5, 0.99, 1.01, 3.0]):
+        # Due east of the center at the given distance.
+        dlng = math.degrees(km / 6371.0 / math.cos(math.radians(center[0])))
+        grid.insert(f"p{i}", center[0], center[1] + dlng)
+    found = sorted(grid.query_radius(*center, 1.0))
+    assert found == ["p0", "p1"]
+    for item_id in found:
+        lat, lng = grid._cells[grid._points[item_id]][item_id]
+        assert haversine_km(*center, lat, lng) <= 1.0
+
+
+def test_grid_remove_and_reinsert_moves_a_point():
+    grid = GridIndex()
+    grid.insert("a", 31.5, 74.3)
+    grid.insert("a", 10.0, 10.0)
+    assert grid.query_bbox(31.4, 74.2, 31.6, 74.4) == []
+    assert grid.query_bbox(9.9, 9.9, 10.1, 10.1) == ["a"]
+    grid.remove("a")
+    grid.remove("a")  # removing twice is a no-op
+    assert len(grid) == 0
@@ -0,0 +1,70 @@
+import random
+from symptom_engine import COMBINATION_ADVICE, SymptomRules, rank_severity
+
+TABLE = {
+    "vomiting": {"severity": "Moderate to Severe", "probable_diagnoses": ["Gastritis", "Obstruction"],
+                 "course_of_action": "Withhold food."},
+    "urinating": {"severity": "Potentially Severe", "probable_diagnoses": ["UTI", "Blockage"],
+                  "course_of_action": "See a vet today."},
+    "itching": {"severity": "Mild to Moderate", "probable_diagnoses": ["Fleas", "Gastritis"],
+                "course_of_action": "Check for fleas."},
+}
+
+
+def test_whole_labels_rank_before_their_first_word():
+    assert rank_severity("Potentially Severe") == ("Potentially Severe", 3)
+    assert rank_severity("Moderate to Severe") == ("Moderate", 2)
+    assert rank_severity("Mild to Moderate") == ("Mild", 1)
+    assert rank_severity("Unheard of") == ("Unheard", 1)
+
+
+def test_potentially_severe_outranks_moderate():
+    # The old split(' ') lookup read "Potentially" and ranked this Mild.
+    result = SymptomRules(TABLE).evaluate(["vomiting", "urinating"])
+    assert result["severity"] == "Potentially Severe"
+    assert SymptomRules(TABLE).evaluate(["vomiting", "itching"])["severity"] == "Moderate"
+
+
+def test_output_is_in_table_order_whatever_the_request_order():
+    rules = SymptomRules(TABLE)
+    expected = {
+        "severity": "Potentially Severe",
+        "probable_diagnoses": ["Gastritis", "Obstruction", "UTI", "Blockage", "Fleas"],
+        "course_of_action": "Withhold food. See a vet today. Check for fleas." + COMBINATION_ADVICE,
+    }
+    symptoms = list(TABLE)
+    for _ in range(10):
+        random.shuffle(symptoms)
+        assert rules.evaluate(symptoms) == expected
+
+
+def test_unknown_symptoms_are_ignored_but_count_towards_a_combination():
+    rules = SymptomRules(TABLE)
+    single = rules.evaluate(["itching"])
+    assert single == {"severity": "Mild", "probable_diagnoses": ["Gastritis", "Fleas"],  # table order
+                      "course_of_action": "Check for fleas."}
+    assert rules.evaluate(["itching", "sneezing"])["course_of_action"] == "Check for fleas." + COMBINATION_ADVICE
+
+
+def test_batch_reports_errors_in_their_own_slots(client):
+    response = client.post('/api/symptom-check/batch', json={"checks": [
+        {"animal_type": "cat", "symptoms": ["vomiting"]},
+        {"animal_type": "parrot", "symptoms": ["vomiting"]},
+        {"animal_type": "cat", "symptoms": []},
+        {"animal_type": "cat", "symptoms": "vomiting"},
+        7,
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert results[0] == client.post('/api/symptom-check', json={"animal_type": "cat", "symptoms": ["vomiting"]}).get_json()
+    assert [r.get("error") for r in results[1:]] == [
+        "Invalid animal type", "No symptoms provided", "symptoms must be a list of strings", "Each check must be an object"]
+
+
+def test_batch_rejects_bodies_without_a_list_of_checks(client, app_module):
+    for body in ([1], "checks", {"checks": []}, {"checks": {}}):
+        response = client.post('/api/symptom-check/batch', json=body)
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "No checks provided"}
+    too_many = [{"animal_type": "cat", "symptoms": ["vomiting"]}] * (app_module.SYMPTOM_BATCH_MAX_CHECKS + 1)
+    assert client.post('/api/symptom-check/batch', json={"checks": too_many}).status_code == 400